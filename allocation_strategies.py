@@ -0,0 +1,136 @@
+from abc import ABC, abstractmethod
+from tasks import AllocationProblem, DependencyGraph
+from typing import List, Optional, Sequence
+import heapq
+import random
+import time
+
+
+class AllocationStrategy(ABC):
+    # Picks the order in which tasks are allocated, every task going in turn
+    # to the resource available first. Orders list task indexes, blockers
+    # before the tasks they block.
+
+    @abstractmethod
+    def allocation_order(self, problem: AllocationProblem) -> List[int]:
+        ...
+
+
+class GreedyAllocation(AllocationStrategy):
+    # Tasks in the order they become unblocked, ties in insertion order. This
+    # is the allocation used without a strategy.
+
+    def allocation_order(self, problem: AllocationProblem) -> List[int]:
+        return problem.dependency_graph.topological_indexes()
+
+
+class LongestPathAllocation(AllocationStrategy):
+    # List scheduling: among the unblocked tasks, the one with the longest
+    # path of working days to the end of the project goes first, so that the
+    # critical path is never left waiting for a resource. Ties go in
+    # insertion order.
+
+    def allocation_order(self, problem: AllocationProblem) -> List[int]:
+        remaining_path = longest_remaining_paths(
+            problem.dependency_graph, problem.task_days)
+        return priority_order(problem.dependency_graph, [-days for days in remaining_path])
+
+
+class LocalSearchAllocation(AllocationStrategy):
+    # Improves the order of another strategy, or of the greedy allocation if
+    # that is shorter, within a time budget. Every step swaps two tasks close
+    # in the order, if blockers stay before the tasks they block, and keeps
+    # the new order unless its cost is higher: a longer makespan or, for the
+    # same makespan, later end dates overall. Steps only depend on the seed,
+    # so a run with the same seed and number of iterations always gives the
+    # same order.
+
+    def __init__(self, seconds: float, seed: int = 0, iterations: Optional[int] = None,
+                 initial: Optional[AllocationStrategy] = None, window: int = 50):
+        self._seconds = seconds
+        self._seed = seed
+        self._iterations = iterations
+        self._initial = initial if initial else LongestPathAllocation()
+        self._window = window
+        # Filled in by the last allocation.
+        self.greedy_makespan: Optional[int] = None
+        self.makespan: Optional[int] = None
+        self.iterations = 0
+
+    def allocation_order(self, problem: AllocationProblem) -> List[int]:
+        deadline = time.perf_counter() + self._seconds
+        rng = random.Random(self._seed)
+        greedy_order = GreedyAllocation().allocation_order(problem)
+        greedy_cost = problem.cost(greedy_order)
+        order = self._initial.allocation_order(problem)
+        cost = problem.cost(order)
+        if greedy_cost < cost:
+            order, cost = greedy_order, greedy_cost
+        self.iterations = 0
+        dependency_graph = problem.dependency_graph
+        position = [0] * len(order)
+        for current, index in enumerate(order):
+            position[index] = current
+        while len(order) > 1 and time.perf_counter() < deadline and \
+                (self._iterations is None or self.iterations < self._iterations):
+            self.iterations += 1
+            first = rng.randrange(len(order) - 1)
+            second = min(first + rng.randint(1, self._window), len(order) - 1)
+            earlier, later = order[first], order[second]
+            # Swapping must keep every blocker before the tasks it blocks.
+            if any(position[blocker] >= first for blocker in dependency_graph.blocked_by_targets[
+                    dependency_graph.blocked_by_offsets[later]:dependency_graph.blocked_by_offsets[later + 1]]) or \
+                    any(position[blocked] <= second for blocked in dependency_graph.blocks_targets[
+                        dependency_graph.blocks_offsets[earlier]:dependency_graph.blocks_offsets[earlier + 1]]):
+                continue
+            candidate = order[:]
+            candidate[first], candidate[second] = later, earlier
+            candidate_cost = problem.cost(candidate)
+            if candidate_cost <= cost:
+                order, cost = candidate, candidate_cost
+                position[earlier], position[later] = second, first
+        self.greedy_makespan = greedy_cost[0]
+        self.makespan = cost[0]
+        return order
+
+
+def longest_remaining_paths(dependency_graph: DependencyGraph, task_days: Sequence[int]) -> List[int]:
+    # Working days of the longest chain of tasks starting with every task.
+    remaining_path = list(task_days)
+    offsets = dependency_graph.blocks_offsets
+    targets = dependency_graph.blocks_targets
+    for index in reversed(dependency_graph.topological_indexes()):
+        longest = 0
+        for blocked in targets[offsets[index]:offsets[index + 1]]:
+            if longest < remaining_path[blocked]:
+                longest = remaining_path[blocked]
+        remaining_path[index] += longest
+    return remaining_path
+
+
+def priority_order(dependency_graph: DependencyGraph, priority: Sequence) -> List[int]:
+    # Kahn's algorithm with the unblocked tasks in a heap: the next task is
+    # the unblocked one with the lowest priority value, ties in insertion
+    # order. Raises CyclicDependencyError like topological_indexes.
+    offsets = dependency_graph.blocks_offsets
+    targets = dependency_graph.blocks_targets
+    remaining_blockers = [dependency_graph.blocked_by_offsets[index + 1] - dependency_graph.blocked_by_offsets[index]
+                          for index in range(len(dependency_graph.codes))]
+    ready = [(priority[index], index) for index in range(len(dependency_graph.codes))
+             if not remaining_blockers[index]]
+    heapq.heapify(ready)
+    order = []
+    while ready:
+        index = heapq.heappop(ready)[1]
+        order.append(index)
+        for blocked in targets[offsets[index]:offsets[index + 1]]:
+            remaining_blockers[blocked] -= 1
+            if not remaining_blockers[blocked]:
+                heapq.heappush(ready, (priority[blocked], blocked))
+    if len(order) < len(dependency_graph.codes):
+        dependency_graph.topological_indexes()
+    return order
+
+
+__all__ = ["AllocationStrategy", "GreedyAllocation", "LongestPathAllocation", "LocalSearchAllocation",
+           "longest_remaining_paths", "priority_order"]
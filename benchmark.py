@@ -0,0 +1,245 @@
+from datetime import date, timedelta
+from tasks import Task, TaskRepository, TimelineCalculator
+from compact_repository import CompactTaskRepository
+from typing import Callable, Dict, List, Iterator, Optional, Tuple
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+GRAPHS = ["chain", "fan", "random"]
+OPERATIONS = ["original_timeline", "remaining_timeline", "original_resource_allocation",
+              "remaining_resource_allocation", "gantt", "resource_timeline"]
+# Modules the command line must not import before it needs them.
+HEAVY_MODULES = ["numpy", "pandas", "plotly", "requests", "pyarrow", "matplotlib"]
+START_DATE = date(2024, 1, 1)
+
+
+def main():
+    arg = parser()
+    repository_class = CompactTaskRepository if arg.repository == "compact" else TaskRepository
+    results = []
+    heavy_modules = []
+    if not arg.no_startup:
+        result = startup(int(arg.repeat))
+        heavy_modules = result["heavy_modules"]
+        results.append(result)
+        print(f"{'cli':>8} {0:>8} {'startup':<30} {result['seconds']:10.4f}s", file=sys.stderr)
+    holidays = synthetic_holidays(int(arg.holidays), random.Random(int(arg.seed)))
+    for graph in arg.graphs:
+        for size in map(int, arg.sizes):
+            tasks = list(synthetic_tasks(graph, size, float(arg.density), random.Random(int(arg.seed))))
+
+            def make_inputs() -> Tuple[TimelineCalculator, TaskRepository]:
+                repository = repository_class()
+                for task in tasks:
+                    repository.save(task)
+                return TimelineCalculator(START_DATE, 8, holidays, [5, 6]), repository
+
+            resources = [f"resource-{i}" for i in range(int(arg.resources))]
+            for operation in arg.operations:
+                result = run_operation(
+                    operation, make_inputs, resources, int(arg.repeat), not arg.no_memory)
+                if result is None:
+                    continue
+                result.update(graph=graph, size=size)
+                results.append(result)
+                print(f"{graph:>8} {size:>8} {operation:<30} {result['seconds']:10.4f}s "
+                      f"(warm {result['warm_seconds']:.4f}s)", file=sys.stderr)
+    report = {"python": platform.python_version(),
+              "commit": current_commit(),
+              "density": float(arg.density),
+              "holidays": int(arg.holidays),
+              "resources": int(arg.resources),
+              "repository": arg.repository,
+              "results": results}
+    with open(arg.output, "w") as f:
+        json.dump(report, f, indent=2)
+    if arg.compare:
+        compare(arg.compare, report)
+    if heavy_modules:
+        sys.exit(f"Startup regression: jira-gantt --help imports {', '.join(heavy_modules)}")
+
+
+def parser():
+    p = argparse.ArgumentParser(
+        description="Times scheduling, allocation and rendering on synthetic task graphs")
+    p.add_argument("--graphs", action="store", nargs="+", dest="graphs", choices=GRAPHS, default=GRAPHS,
+                   help="Shapes of the synthetic dependency graphs")
+    p.add_argument("--sizes", action="store", nargs="+", dest="sizes", default=[100, 1000, 10000, 100000],
+                   help="Number of tasks of the synthetic graphs")
+    p.add_argument("--operations", action="store", nargs="+", dest="operations", choices=OPERATIONS, default=OPERATIONS,
+                   help="Operations to time")
+    p.add_argument("--density", action="store", dest="density", default=2,
+                   help="Average number of tasks blocked by a task in the random graph (default 2)")
+    p.add_argument("--holidays", action="store", dest="holidays", default=300,
+                   help="Number of holidays in the calendar (default 300)")
+    p.add_argument("--resources", action="store", dest="resources", default=10,
+                   help="Number of resources for the resource allocation (default 10)")
+    p.add_argument("--repository", action="store", dest="repository", choices=["compact", "dict"], default="compact",
+                   help="Task repository implementation (default compact)")
+    p.add_argument("--repeat", action="store", dest="repeat", default=3,
+                   help="Number of cold and of warm timed runs of every operation, the fastest of each is "
+                        "reported (default 3)")
+    p.add_argument("--no-memory", action="store_true", dest="no_memory",
+                   help="Do not measure the peak memory, which needs an additional traced run")
+    p.add_argument("--no-startup", action="store_true", dest="no_startup",
+                   help="Do not time the startup of the command line, which fails the run if it imports any of "
+                        + ", ".join(HEAVY_MODULES))
+    p.add_argument("--seed", action="store", dest="seed", default=0,
+                   help="Seed of the synthetic graphs (default 0)")
+    p.add_argument("--output", action="store", dest="output", default="benchmark.json",
+                   help="JSON file where the results are saved (default benchmark.json)")
+    p.add_argument("--compare", action="store", dest="compare",
+                   help="JSON file of previous results to compare the timings with")
+    return p.parse_args()
+
+
+def synthetic_tasks(graph: str, size: int, density: float, rng: random.Random) -> Iterator[Task]:
+    if graph == "chain":
+        blocks = _chain
+    elif graph == "fan":
+        blocks = _fan
+    else:
+        blocks = lambda index, size: _random(index, size, density, rng)
+    for index in range(size):
+        yield Task(code=f"SYN-{index}",
+                   blocks=[f"SYN-{blocked}" for blocked in blocks(index, size)],
+                   description=f"Synthetic task {index}",
+                   link=f"https://jira.example.com/browse/SYN-{index}",
+                   original_estimate_hours=rng.choice([2, 4, 8, 16, 24, 40]),
+                   remaining_estimate_hours=rng.choice([0, 2, 4, 8, 16]))
+
+
+def _chain(index: int, size: int) -> List[int]:
+    return [index + 1] if index + 1 < size else []
+
+
+def _fan(index: int, size: int, width: int = 100) -> List[int]:
+    # Hub tasks every width + 1 tasks block the width tasks after them, which
+    # all block the next hub.
+    layer_start = index - index % (width + 1)
+    if index == layer_start:
+        return list(range(index + 1, min(index + width + 1, size)))
+    next_hub = layer_start + width + 1
+    return [next_hub] if next_hub < size else []
+
+
+def _random(index: int, size: int, density: float, rng: random.Random) -> List[int]:
+    # Links only go forward, and mostly to nearby tasks, so the graph is a DAG
+    # with long paths as well as wide levels.
+    later = size - index - 1
+    if not later:
+        return []
+    count = min(later, int(rng.expovariate(1 / density) + 0.5) if density else 0)
+    window = min(later, max(count, 200))
+    return sorted(index + 1 + offset for offset in rng.sample(range(window), count))
+
+
+def synthetic_holidays(count: int, rng: random.Random) -> List[date]:
+    return sorted({START_DATE + timedelta(days=rng.randrange(count * 4 + 1)) for _ in range(count)})
+
+
+def run_operation(operation: str, make_inputs: Callable[[], Tuple[TimelineCalculator, TaskRepository]],
+                  resources: List[str], repeat: int, measure_memory: bool) -> Optional[Dict]:
+    # Cold runs get a new calculator and repository, as the command line
+    # does, so they include building the dependency graph and growing the
+    # working calendars. Warm runs reuse those of the last cold run.
+    if operation == "original_timeline":
+        run = lambda calculator, repository: calculator.compute_original_timeline(repository)
+    elif operation == "remaining_timeline":
+        run = lambda calculator, repository: calculator.compute_remaining_timeline(repository)
+    elif operation == "original_resource_allocation":
+        run = lambda calculator, repository: calculator.compute_original_resource_allocation(repository, resources)
+    elif operation == "remaining_resource_allocation":
+        run = lambda calculator, repository: calculator.compute_remaining_resource_allocation(repository, resources)
+    else:
+        run = _rendering(operation, make_inputs, resources)
+        if run is None:
+            return None
+    cold_seconds = []
+    for _ in range(repeat):
+        calculator, repository = make_inputs()
+        cold_seconds.append(_time(lambda: run(calculator, repository)))
+    result = {"operation": operation,
+              "seconds": min(cold_seconds),
+              "warm_seconds": min(_time(lambda: run(calculator, repository)) for _ in range(repeat))}
+    if measure_memory:
+        calculator, repository = make_inputs()
+        tracemalloc.start()
+        run(calculator, repository)
+        result["peak_memory_bytes"] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return result
+
+
+def _rendering(operation: str, make_inputs: Callable[[], Tuple[TimelineCalculator, TaskRepository]],
+               resources: List[str]) -> Optional[Callable[[TimelineCalculator, TaskRepository], None]]:
+    try:
+        # Charts are drawn with plotly, imported only when rendering.
+        import plotly.express  # noqa: F401
+        calculator, repository = make_inputs()
+        if operation == "gantt":
+            from jira_cli import make_gantt as render
+            timeline_tasks = calculator.compute_original_timeline(repository)
+        else:
+            from jira_cli import make_timeline as render
+            timeline_tasks = calculator.compute_original_resource_allocation(
+                repository, resources)
+    except ImportError as e:
+        print(f"Skipping {operation}: {e}", file=sys.stderr)
+        return None
+    output = os.path.join(tempfile.mkdtemp(), operation)
+    # Only the rendering is timed, from the same timeline every run.
+    return lambda calculator, repository: render(timeline_tasks, output)
+
+
+def startup(repeat: int) -> Dict:
+    # Times jira_cli.py gantt --help in a new interpreter, and lists the
+    # heavy modules it imported according to -X importtime.
+    command = [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "jira_cli.py"),
+               "gantt", "--help"]
+    seconds = min(_time(lambda: subprocess.run(command, capture_output=True, check=True)) for _ in range(repeat))
+    imports = subprocess.run([sys.executable, "-X", "importtime"] + command[1:], capture_output=True, text=True,
+                             check=True).stderr
+    imported = {line.rpartition("|")[2].strip().split(".")[0] for line in imports.splitlines()}
+    return {"graph": "cli", "size": 0, "operation": "startup", "seconds": seconds,
+            "heavy_modules": [module for module in HEAVY_MODULES if module in imported]}
+
+
+def _time(run: Callable[[], None]) -> float:
+    started = time.perf_counter()
+    run()
+    return time.perf_counter() - started
+
+
+def current_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except OSError:
+        return ""
+
+
+def compare(baseline_file: str, report: Dict):
+    with open(baseline_file) as f:
+        baseline = {(r["graph"], r["size"], r["operation"]): r for r in json.load(f)["results"]}
+    for result in report["results"]:
+        previous = baseline.get(
+            (result["graph"], result["size"], result["operation"]))
+        if previous:
+            print(f"{result['graph']:>8} {result['size']:>8} {result['operation']:<30} "
+                  f"{previous['seconds']:10.4f}s -> {result['seconds']:10.4f}s ({result['seconds'] / previous['seconds']:6.2f}x)")
+            if "warm_seconds" in previous and "warm_seconds" in result:
+                print(f"{'':>8} {'':>8} {'warm':<30} {previous['warm_seconds']:10.4f}s -> "
+                      f"{result['warm_seconds']:10.4f}s ({result['warm_seconds'] / previous['warm_seconds']:6.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
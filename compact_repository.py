@@ -0,0 +1,105 @@
+from array import array
+from tasks import DependencyGraph, Task, TaskRepository
+from typing import Dict, List, Optional, Set, Tuple
+import sys
+
+
+class CompactTaskRepository(TaskRepository):
+    # Same interface as TaskRepository for large task sets: issue keys are
+    # interned to dense integer ids in insertion order, tasks are stored as
+    # columns and the dependency graph is built once and reused until the
+    # next save. Tasks are copied in on save and rebuilt on get. Removed
+    # tasks leave a tombstone, and the columns are compacted once before the
+    # ids are next used as graph indexes.
+
+    def __init__(self):
+        self._ids: Dict[str, int] = {}
+        self._codes: List[Optional[str]] = []
+        self._blocks: List[Tuple[str, ...]] = []
+        self._descriptions: List[Optional[str]] = []
+        self._links: List[Optional[str]] = []
+        self._original_estimates = array("d")
+        self._remaining_estimates = array("d")
+        self._removed = 0
+        self._dependency_graph: Optional[DependencyGraph] = None
+
+    def save(self, task: Task):
+        blocks = tuple(sys.intern(code) for code in task.blocks)
+        if task.code in self._ids:
+            task_id = self._ids[task.code]
+            self._blocks[task_id] = blocks
+            self._descriptions[task_id] = task.description
+            self._links[task_id] = task.link
+            self._original_estimates[task_id] = task.original_estimate_hours
+            self._remaining_estimates[task_id] = task.remaining_estimate_hours
+        else:
+            code = sys.intern(task.code)
+            self._ids[code] = len(self._codes)
+            self._codes.append(code)
+            self._blocks.append(blocks)
+            self._descriptions.append(task.description)
+            self._links.append(task.link)
+            self._original_estimates.append(task.original_estimate_hours)
+            self._remaining_estimates.append(task.remaining_estimate_hours)
+        self._dependency_graph = None
+
+    def remove(self, code: str):
+        if code not in self._ids:
+            return
+        task_id = self._ids.pop(code)
+        self._codes[task_id] = None
+        self._blocks[task_id] = ()
+        self._removed += 1
+        self._dependency_graph = None
+
+    def get(self, code: str) -> Optional[Task]:
+        if code in self._ids:
+            task_id = self._ids[code]
+            return Task(code=self._codes[task_id],
+                        blocks=list(self._blocks[task_id]),
+                        description=self._descriptions[task_id],
+                        link=self._links[task_id],
+                        original_estimate_hours=self._original_estimates[task_id],
+                        remaining_estimate_hours=self._remaining_estimates[task_id])
+        else:
+            return None
+
+    def codes(self) -> Set[str]:
+        return set(self._ids)
+
+    def is_blocked_by_map(self) -> Dict[str, Set[str]]:
+        dependency_graph = self.dependency_graph()
+        return {code: set(dependency_graph.blockers(code)) for code in self._codes}
+
+    def dependency_graph(self) -> DependencyGraph:
+        if self._dependency_graph is None:
+            self._compact()
+            self._dependency_graph = DependencyGraph.from_blocks(self._codes,
+                                                                 ([self._ids[code_blocked] for code_blocked in dict.fromkeys(blocks)
+                                                                   if code_blocked in self._ids]
+                                                                  for blocks in self._blocks))
+        return self._dependency_graph
+
+    def original_estimates(self) -> array:
+        self._compact()
+        return self._original_estimates
+
+    def remaining_estimates(self) -> array:
+        self._compact()
+        return self._remaining_estimates
+
+    def _compact(self):
+        if not self._removed:
+            return
+        kept = [task_id for task_id, code in enumerate(self._codes) if code is not None]
+        self._codes = [self._codes[task_id] for task_id in kept]
+        self._blocks = [self._blocks[task_id] for task_id in kept]
+        self._descriptions = [self._descriptions[task_id] for task_id in kept]
+        self._links = [self._links[task_id] for task_id in kept]
+        self._original_estimates = array("d", (self._original_estimates[task_id] for task_id in kept))
+        self._remaining_estimates = array("d", (self._remaining_estimates[task_id] for task_id in kept))
+        self._ids = {code: task_id for task_id, code in enumerate(self._codes)}
+        self._removed = 0
+
+
+__all__ = ["CompactTaskRepository"]
@@ -0,0 +1,169 @@
+from dataclasses import dataclass
+from datetime import date
+from tasks import DependencyGraph, TaskRepository, _slots
+from typing import List, Optional, Tuple
+from working_calendar import WorkingCalendar
+import numpy as np
+
+
+@_slots
+@dataclass
+class CriticalPathTask:
+    code: str
+    description: Optional[str]
+    link: Optional[str]
+    earliest_start: date
+    earliest_end: date
+    latest_start: date
+    latest_end: date
+    total_float: int
+    critical: bool
+
+
+class DependencyLevels:
+    # Tasks and blocking links grouped by dependency level, where a task is
+    # one level after the last of its blockers, so that a pass over the
+    # levels in order sees every blocker before the tasks it blocks. Every
+    # level is processed with a few vectorized operations.
+
+    def __init__(self, dependency_graph: DependencyGraph):
+        size = len(dependency_graph.codes)
+        offsets = np.frombuffer(
+            dependency_graph.blocks_offsets, dtype=np.int32).astype(np.int64)
+        sources = np.repeat(np.arange(size), np.diff(offsets))
+        targets = np.frombuffer(
+            dependency_graph.blocks_targets, dtype=np.int32).astype(np.int64)
+        self.level = _levels(dependency_graph)
+        self.count = int(self.level.max()) + 1 if size else 0
+        tasks, task_bounds = _group(self.level, self.level, self.count)
+        self._tasks = [tasks[task_bounds[level]:task_bounds[level + 1]]
+                       for level in range(self.count)]
+        self._into = _links_by_level(
+            self.level, targets, sources, self.count)
+        self._from = _links_by_level(
+            self.level, sources, targets, self.count)
+
+    def level_tasks(self, level: int) -> np.ndarray:
+        return self._tasks[level]
+
+    def links_into(self, level: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        # Tasks of the level with blockers, their blockers grouped by blocked
+        # task and where every group starts, to be reduced with reduceat.
+        return self._into[level]
+
+    def links_from(self, level: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        # Tasks of the level blocking other tasks, the tasks they block
+        # grouped by blocking task and where every group starts.
+        return self._from[level]
+
+
+def _links_by_level(level: np.ndarray, keys: np.ndarray, values: np.ndarray,
+                    count: int) -> List[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+    order, bounds = _group(level[keys] * len(level) + keys, level[keys], count)
+    keys = keys[order]
+    values = values[order]
+    group_starts = np.flatnonzero(np.diff(keys, prepend=-1))
+    group_keys = keys[group_starts]
+    group_bounds = np.searchsorted(group_starts, bounds)
+    return [(group_keys[group_bounds[current]:group_bounds[current + 1]],
+             values[bounds[current]:bounds[current + 1]],
+             group_starts[group_bounds[current]:group_bounds[current + 1]] - bounds[current])
+            for current in range(count)]
+
+
+def _levels(dependency_graph: DependencyGraph) -> np.ndarray:
+    # Raises CyclicDependencyError naming the tasks in a cycle.
+    offsets = dependency_graph.blocks_offsets
+    targets = dependency_graph.blocks_targets
+    level = [0] * len(dependency_graph.codes)
+    for index in dependency_graph.topological_indexes():
+        next_level = level[index] + 1
+        for blocked in targets[offsets[index]:offsets[index + 1]]:
+            if level[blocked] < next_level:
+                level[blocked] = next_level
+    return np.array(level, dtype=np.int64)
+
+
+def _group(keys: np.ndarray, level: np.ndarray, count: int) -> Tuple[np.ndarray, np.ndarray]:
+    # Order of keys, sorted by level first, and where every level starts.
+    order = np.argsort(keys, kind="stable")
+    bounds = np.searchsorted(level[order], np.arange(count + 1))
+    return order, bounds
+
+
+def task_days(hours: np.ndarray, hours_in_day: float) -> np.ndarray:
+    return np.ceil(hours / hours_in_day).astype(np.int32)
+
+
+def forward_pass(levels: DependencyLevels, days: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    # Forward pass in working days from the first working day. days can have
+    # a column of durations per sample, all samples are computed together.
+    earliest_start = np.zeros_like(days)
+    earliest_end = np.zeros_like(days)
+    for level in range(levels.count):
+        blocked, blockers, starts = levels.links_into(level)
+        if blocked.size:
+            earliest_start[blocked] = np.maximum.reduceat(
+                earliest_end[blockers], starts)
+        tasks = levels.level_tasks(level)
+        earliest_end[tasks] = earliest_start[tasks] + days[tasks]
+    return earliest_start, earliest_end
+
+
+def backward_pass(levels: DependencyLevels, days: np.ndarray, project_end) -> Tuple[np.ndarray, np.ndarray]:
+    # Backward pass in working days from the end of the project, which can
+    # be one per sample.
+    latest_end = np.empty_like(days)
+    latest_end[...] = project_end
+    latest_start = np.zeros_like(days)
+    for level in reversed(range(levels.count)):
+        blocking, blocked, starts = levels.links_from(level)
+        if blocking.size:
+            latest_end[blocking] = np.minimum.reduceat(
+                latest_start[blocked], starts)
+        tasks = levels.level_tasks(level)
+        latest_start[tasks] = latest_end[tasks] - days[tasks]
+    return latest_start, latest_end
+
+
+def compute_critical_path(task_repository: TaskRepository, hours, hours_in_day: float,
+                          calendar: WorkingCalendar, start_date: date) -> List[CriticalPathTask]:
+    # Working day n is the n-th working day on or after start_date, counting
+    # from 0. A task running from working day s to working day e (excluded)
+    # starts on day s and ends on the day after working day e - 1, like in
+    # the timeline, or on day s when it takes no time.
+    dependency_graph = task_repository.dependency_graph()
+    levels = DependencyLevels(dependency_graph)
+    days = task_days(np.frombuffer(hours, dtype=np.float64), hours_in_day)
+    earliest_start, earliest_end = forward_pass(levels, days)
+    project_end = int(earliest_end.max()) if days.size else 0
+    latest_start_days, latest_end_days = backward_pass(
+        levels, days, project_end)
+    total_float = latest_start_days - earliest_start
+    working_days = calendar.working_day_ordinals(start_date, project_end + 1)
+    start_dates = [date.fromordinal(ordinal) for ordinal in working_days]
+    end_dates = [None] + [date.fromordinal(ordinal + 1)
+                          for ordinal in working_days[:-1]]
+
+    def end_date(start: int, end: int) -> date:
+        return end_dates[end] if end > start else start_dates[start]
+
+    result = []
+    for index, code in enumerate(dependency_graph.codes):
+        task = task_repository.get(code)
+        result.append(CriticalPathTask(code=code,
+                                       description=task.description,
+                                       link=task.link,
+                                       earliest_start=start_dates[earliest_start[index]],
+                                       earliest_end=end_date(
+                                           earliest_start[index], earliest_end[index]),
+                                       latest_start=start_dates[latest_start_days[index]],
+                                       latest_end=end_date(
+                                           latest_start_days[index], latest_end_days[index]),
+                                       total_float=int(total_float[index]),
+                                       critical=bool(total_float[index] == 0)))
+    return result
+
+
+__all__ = ["CriticalPathTask", "DependencyLevels", "task_days",
+           "compute_critical_path", "forward_pass", "backward_pass"]
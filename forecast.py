@@ -0,0 +1,189 @@
+from concurrent.futures import ProcessPoolExecutor
+from critical_path import DependencyLevels, forward_pass, task_days
+from dataclasses import dataclass
+from datetime import date
+from tasks import TaskRepository, _slots
+from typing import Dict, List, Optional, Sequence
+from working_calendar import WorkingCalendar
+import numpy as np
+
+DISTRIBUTIONS = ["lognormal", "triangular"]
+PERCENTILES = (50, 80, 95)
+SAMPLE_BATCH_SIZE = 500
+# Samples of a batch times tasks, so that the durations and dates of a
+# batch stay within a few hundred megabytes for large boards.
+SAMPLE_BATCH_CELLS = 2 ** 23
+
+
+@_slots
+@dataclass
+class TaskForecast:
+    code: str
+    description: Optional[str]
+    link: Optional[str]
+    # Completion date by percentile.
+    end: Dict[int, date]
+
+
+@_slots
+@dataclass
+class Forecast:
+    samples: int
+    tasks: List[TaskForecast]
+    project_end: Dict[int, date]
+
+
+def sample_hours(hours: np.ndarray, samples: int, distribution: str, spread: float,
+                 rng: np.random.Generator) -> np.ndarray:
+    # One column of durations per sample. lognormal keeps the estimate as
+    # the median with spread as the standard deviation of its logarithm,
+    # triangular goes from spread below the estimate to twice spread above
+    # it, as fractions of the estimate, with the estimate as the mode.
+    shape = (len(hours), samples)
+    hours = hours[:, None]
+    if spread <= 0:
+        return np.broadcast_to(hours, shape)
+    if distribution == "lognormal":
+        factors = np.exp(spread * rng.standard_normal(shape, dtype=np.float32))
+    elif distribution == "triangular":
+        factors = rng.triangular(max(1 - spread, 0), 1, 1 + 2 * spread, shape)
+    else:
+        raise ValueError(f"Unknown distribution {distribution}, expected one of {', '.join(DISTRIBUTIONS)}")
+    return hours * factors
+
+
+def end_codes(levels: DependencyLevels, hours: np.ndarray, hours_in_day: float, samples: int,
+              distribution: str, spread: float, seed: np.random.SeedSequence) -> np.ndarray:
+    # End code of every sample, one row per task plus a last row for the
+    # whole project. A task taking d working days from working day s ends on
+    # working day s + d, which is coded 2 * (s + d) + 1 when d is 0, as it
+    # then ends on the day it starts and not the day after the previous
+    # working day, so that codes sort like dates.
+    days = task_days(sample_hours(hours, samples, distribution, spread,
+                                  np.random.default_rng(seed)), hours_in_day)
+    _, earliest_end = forward_pass(levels, days)
+    codes = 2 * earliest_end + (days == 0)
+    return np.concatenate([codes, codes.max(axis=0, initial=0)[None, :]]).astype(np.int32)
+
+
+class EndHistogram:
+    # Counts of the samples ending on every end code, per row, kept only over
+    # the range of codes seen for the row: code c of row i is counted in
+    # counts[offsets[i] + c - low[i]]. Rows span a few weeks around their
+    # dates even when the project spans years. Ranges grow with some slack,
+    # so that later samples seldom need a copy of the counts.
+
+    _CHUNK_ROWS = 4096
+
+    def __init__(self, rows: int):
+        self.low = np.zeros(rows, dtype=np.int64)
+        self.high = np.full(rows, -1, dtype=np.int64)
+        self.offsets = np.zeros(rows + 1, dtype=np.int64)
+        self.counts = np.zeros(0, dtype=np.int32)
+
+    def add(self, codes: np.ndarray):
+        low = codes.min(axis=1)
+        high = codes.max(axis=1)
+        if (low < self.low).any() or (high > self.high).any():
+            self._grow(low, high)
+        np.add.at(self.counts, (codes - self.low[:, None] + self.offsets[:-1, None]).ravel(), np.int32(1))
+
+    def percentile_codes(self, samples: int, percentiles: Sequence[int]) -> Dict[int, np.ndarray]:
+        # The first end code of every row reached by at least that share of
+        # the samples, a few thousand rows at a time.
+        codes = {percentile: np.empty(len(self.low), dtype=np.int64) for percentile in percentiles}
+        for first in range(0, len(self.low), self._CHUNK_ROWS):
+            last = min(first + self._CHUNK_ROWS, len(self.low))
+            starts = self.offsets[first:last] - self.offsets[first]
+            cumulative = np.cumsum(self.counts[self.offsets[first]:self.offsets[last]], dtype=np.int64)
+            before = np.where(starts > 0, cumulative[starts - 1], 0)
+            for percentile in percentiles:
+                codes[percentile][first:last] = self.low[first:last] - starts + np.searchsorted(
+                    cumulative, before + np.ceil(samples * percentile / 100))
+        return codes
+
+    def _grow(self, low: np.ndarray, high: np.ndarray):
+        empty = self.high < self.low
+        slack = np.where(empty, 0, (np.maximum(high, self.high) - np.minimum(low, self.low)) // 4 + 1)
+        new_low = np.where(empty, low, np.where(low < self.low, np.maximum(low - slack, 0), self.low))
+        new_high = np.where(empty, high, np.where(high > self.high, high + slack, self.high))
+        new_offsets = np.concatenate([[0], np.cumsum(new_high - new_low + 1)])
+        counts = np.zeros(new_offsets[-1], dtype=np.int32)
+        # Rows are copied a few thousand at a time to bound the indexes.
+        for first in range(0, len(self.low), self._CHUNK_ROWS):
+            last = min(first + self._CHUNK_ROWS, len(self.low))
+            start, end = self.offsets[first], self.offsets[last]
+            shift = new_offsets[first:last] + self.low[first:last] - new_low[first:last] - self.offsets[first:last]
+            counts[np.arange(start, end) + np.repeat(shift, np.diff(self.offsets[first:last + 1]))] = \
+                self.counts[start:end]
+        self.low, self.high, self.offsets, self.counts = new_low, new_high, new_offsets, counts
+
+
+_worker_levels: Optional[DependencyLevels] = None
+
+
+def _init_worker(levels: DependencyLevels):
+    global _worker_levels
+    _worker_levels = levels
+
+
+def _worker_end_codes(*args) -> np.ndarray:
+    return end_codes(_worker_levels, *args)
+
+
+def forecast(task_repository: TaskRepository, hours, hours_in_day: float, calendar: WorkingCalendar,
+             start_date: date, samples: int, distribution: str = "lognormal", spread: float = 0.3,
+             seed: Optional[int] = None, workers: int = 0,
+             percentiles: Sequence[int] = PERCENTILES) -> Forecast:
+    # Samples are evaluated in batches, all the samples of a batch in the
+    # same vectorized passes, in worker processes when workers is positive.
+    # Workers only send back the end codes of their batch. Every batch has
+    # its own random stream, so results for a seed do not depend on the
+    # number of workers.
+    if distribution not in DISTRIBUTIONS:
+        raise ValueError(f"Unknown distribution {distribution}, expected one of {', '.join(DISTRIBUTIONS)}")
+    if samples < 1:
+        raise ValueError("At least one sample is required")
+    dependency_graph = task_repository.dependency_graph()
+    levels = DependencyLevels(dependency_graph)
+    hours = np.frombuffer(hours, dtype=np.float64)
+    batch_size = max(1, min(SAMPLE_BATCH_SIZE, SAMPLE_BATCH_CELLS // (len(hours) + 1)))
+    batches = [min(batch_size, samples - first)
+               for first in range(0, samples, batch_size)]
+    seeds = np.random.SeedSequence(seed).spawn(len(batches))
+    arguments = [(hours, hours_in_day, batch, distribution, spread, batch_seed)
+                 for batch, batch_seed in zip(batches, seeds)]
+    histogram = EndHistogram(len(hours) + 1)
+    if workers > 0 and len(batches) > 1:
+        with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(levels,)) as executor:
+            for codes in executor.map(_worker_end_codes, *zip(*arguments)):
+                histogram.add(codes)
+    else:
+        for argument in arguments:
+            histogram.add(end_codes(levels, *argument))
+
+    percentile_codes = histogram.percentile_codes(samples, percentiles)
+    last_day = max(int(codes.max()) for codes in percentile_codes.values()) // 2
+    working_days = calendar.working_day_ordinals(start_date, last_day + 1)
+
+    def end_date(code: int) -> date:
+        if code % 2:
+            return date.fromordinal(working_days[code // 2])
+        return date.fromordinal(working_days[code // 2 - 1] + 1) if code else start_date
+
+    dates = {percentile: [end_date(code) for code in codes.tolist()]
+             for percentile, codes in percentile_codes.items()}
+    result = []
+    for index, code in enumerate(dependency_graph.codes):
+        task = task_repository.get(code)
+        result.append(TaskForecast(code=code,
+                                   description=task.description,
+                                   link=task.link,
+                                   end={percentile: dates[percentile][index] for percentile in percentiles}))
+    return Forecast(samples=samples,
+                    tasks=result,
+                    project_end={percentile: dates[percentile][-1] for percentile in percentiles})
+
+
+__all__ = ["Forecast", "TaskForecast", "DISTRIBUTIONS",
+           "forecast", "sample_hours", "end_codes", "EndHistogram"]
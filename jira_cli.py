@@ -0,0 +1,439 @@
+from allocation_strategies import AllocationStrategy, GreedyAllocation, LocalSearchAllocation, LongestPathAllocation
+from compact_repository import CompactTaskRepository
+from datetime import date, datetime
+from run_stats import RunStats, phase
+from rendering import FORMATS, HTML_MODES, Chart, Columns, collapse, render, timeline_columns
+from tasks import Task, TaskRepository, TimelineCalculator, TimelineTask, TimelineTaskWithResource
+from task_files import load_tasks, export_tasks
+from typing import TYPE_CHECKING, Dict, List, Optional, Sequence, Tuple
+import argparse
+import sys
+
+# The Jira client, numpy, pandas and plotly are imported by the code paths
+# using them, so that --help, reading files and writing CSV, JSON or
+# iCalendar output never load them.
+if TYPE_CHECKING:
+    from critical_path import CriticalPathTask
+    from forecast import Forecast
+
+
+def main(argv: Optional[List[str]] = None):
+    arg = parser(argv)
+    stats = RunStats() if arg.stats_json else None
+    if arg.profile:
+        import cProfile
+        profiler = cProfile.Profile()
+        try:
+            profiler.runcall(arg.run, arg, stats)
+        finally:
+            profiler.dump_stats(arg.profile)
+    else:
+        arg.run(arg, stats)
+    if stats is not None:
+        stats.write(arg.stats_json)
+
+
+def run_gantt(arg, stats: Optional[RunStats] = None):
+    timeline_calculator = make_timeline_calculator(arg.start_date, float(
+        arg.day_duration), arg.exclude, arg.holiday_weekday, stats=stats)
+    with phase(stats, "load"):
+        repository = load_repository(arg, stats)
+    with phase(stats, "timeline"):
+        if arg.mode == "original":
+            timeline_tasks = timeline_calculator.compute_original_timeline(
+                repository)
+        else:
+            timeline_tasks = timeline_calculator.compute_remaining_timeline(
+                repository)
+    with phase(stats, "critical_path"):
+        critical_path = compute_critical_path(
+            arg, timeline_calculator, repository)
+    forecast = None
+    if arg.simulations:
+        options = dict(distribution=arg.distribution, spread=float(arg.spread),
+                       seed=int(arg.seed) if arg.seed is not None else None, workers=int(arg.workers))
+        with phase(stats, "forecast"):
+            if arg.mode == "original":
+                forecast = timeline_calculator.forecast_original_timeline(
+                    repository, int(arg.simulations), **options)
+            else:
+                forecast = timeline_calculator.forecast_remaining_timeline(
+                    repository, int(arg.simulations), **options)
+        print(" ".join(f"P{percentile}: {end.strftime('%Y-%m-%d')}"
+                       for percentile, end in forecast.project_end.items()))
+    groups = None
+    if arg.collapse_above is not None and len(timeline_tasks) > int(arg.collapse_above):
+        groups = dependency_groups(repository)
+    with phase(stats, "render"):
+        make_gantt(timeline_tasks, arg.output, critical_path, forecast,
+                   arg.format, arg.html_mode, groups)
+
+
+def run_allocate(arg, stats: Optional[RunStats] = None):
+    timeline_calculator = make_timeline_calculator(arg.start_date, float(
+        arg.day_duration), arg.exclude, arg.holiday_weekday, arg.resource_exclude, stats)
+    with phase(stats, "load"):
+        repository = load_repository(arg, stats)
+    strategy = make_strategy(arg)
+    with phase(stats, "allocation"):
+        if arg.mode == "original":
+            timeline_tasks = timeline_calculator.compute_original_resource_allocation(
+                repository, arg.resources, parse_capacities(arg.capacity), strategy)
+        else:
+            timeline_tasks = timeline_calculator.compute_remaining_resource_allocation(
+                repository, arg.resources, parse_capacities(arg.capacity), strategy)
+    if isinstance(strategy, LocalSearchAllocation):
+        improvement = (1 - strategy.makespan / strategy.greedy_makespan) if strategy.greedy_makespan else 0
+        print(f"Makespan {strategy.makespan} working days, {strategy.greedy_makespan} with the greedy allocation "
+              f"({improvement:.1%} shorter) after {strategy.iterations} iterations", file=sys.stderr)
+    with phase(stats, "critical_path"):
+        critical_path = compute_critical_path(
+            arg, timeline_calculator, repository)
+    with phase(stats, "render"):
+        make_timeline(timeline_tasks, arg.output, critical_path, arg.format, arg.html_mode,
+                      int(arg.collapse_above) if arg.collapse_above is not None else None)
+
+
+def run_serve(arg, stats: Optional[RunStats] = None):
+    from planning_service import PlanningService, serve
+    service = PlanningService(lambda query: fetch_tasks(argparse.Namespace(**dict(vars(arg), jira_query=query))),
+                              float(arg.day_duration), int(arg.results))
+    serve(service, arg.host, int(arg.port), float(arg.refresh_seconds))
+
+
+def compute_critical_path(arg, timeline_calculator: TimelineCalculator,
+                          repository: TaskRepository) -> Optional[List["CriticalPathTask"]]:
+    if not arg.critical_path:
+        return None
+    if arg.mode == "original":
+        return timeline_calculator.compute_original_critical_path(repository)
+    return timeline_calculator.compute_remaining_critical_path(repository)
+
+
+def make_strategy(arg) -> Optional[AllocationStrategy]:
+    strategy = LongestPathAllocation() if arg.strategy == "longest-path" else None
+    if arg.optimize_seconds:
+        return LocalSearchAllocation(float(arg.optimize_seconds), int(arg.seed),
+                                     int(arg.optimize_iterations) if arg.optimize_iterations else None,
+                                     strategy if strategy else GreedyAllocation())
+    return strategy
+
+
+def load_repository(arg, stats: Optional[RunStats] = None) -> TaskRepository:
+    if arg.input_file:
+        return load_tasks(arg.input_file, CompactTaskRepository())
+    return make_repository(fetch_tasks(arg, stats))
+
+
+def fetch_tasks(arg, stats: Optional[RunStats] = None) -> List[Task]:
+    from jira_task_extraction import extract_tasks_from_search, FetchStats
+    from task_cache import TaskCache, sync_tasks_from_search
+    fetch_stats = FetchStats()
+    crawl_budget = int(arg.crawl_budget) if arg.crawl_budget is not None else None
+    if arg.cache_dir:
+        tasks = sync_tasks_from_search(TaskCache(arg.cache_dir), arg.user, arg.password, arg.jira_url, arg.jira_query,
+                                       arg.dependency_types, int(arg.page_size), int(arg.concurrency), arg.refresh, arg.offline, fetch_stats,
+                                       int(arg.crawl_depth), crawl_budget)
+    else:
+        tasks = extract_tasks_from_search(
+            arg.user, arg.password, arg.jira_url, arg.jira_query, arg.dependency_types,
+            int(arg.page_size), int(arg.concurrency), fetch_stats, int(arg.crawl_depth), crawl_budget)
+    print(fetch_stats, file=sys.stderr)
+    if stats is not None:
+        stats.count("jira_issues", fetch_stats.issues)
+        stats.count("jira_pages", fetch_stats.pages)
+        stats.count("jira_bytes", fetch_stats.bytes)
+        stats.phases["jira_fetch"] = fetch_stats.elapsed_seconds
+    if arg.export_file:
+        export_tasks(tasks, arg.export_file)
+    return tasks
+
+
+def parser(argv: Optional[List[str]] = None):
+    p = argparse.ArgumentParser(
+        prog="jira-gantt", description="Plans Jira issues as a Gantt chart or as an allocation between resources")
+    commands = p.add_subparsers(dest="command", required=True)
+    gantt = commands.add_parser(
+        "gantt", help="Gantt chart of the issues with unlimited resources")
+    add_calendar_arguments(gantt)
+    add_output_arguments(
+        gantt, "Above this number of tasks, show one bar for every group of tasks linked by dependencies")
+    add_source_arguments(gantt)
+    add_schedule_arguments(gantt)
+    gantt.add_argument("--simulations", action="store", dest="simulations", required=False,
+                       help="Number of Monte Carlo samples of the task durations, prints the P50, P80 and P95 completion dates of the project and shows those of every task")
+    gantt.add_argument("--distribution", action="store", dest="distribution", required=False, default="lognormal",
+                       help="Distribution of the sampled durations around the estimates, lognormal or triangular (default lognormal)")
+    gantt.add_argument("--spread", action="store", dest="spread", required=False, default=0.3,
+                       help="Spread of the sampled durations as a fraction of the estimates (default 0.3)")
+    gantt.add_argument("--seed", action="store", dest="seed", required=False,
+                       help="Seed of the Monte Carlo samples")
+    gantt.add_argument("--workers", action="store", dest="workers", required=False, default=0,
+                       help="Number of processes evaluating the Monte Carlo samples (default 0, in this process)")
+    add_instrumentation_arguments(gantt)
+    add_query_argument(gantt)
+    gantt.set_defaults(run=run_gantt)
+    allocate = commands.add_parser(
+        "allocate", help="Timeline of an allocation of the issues between resources")
+    add_calendar_arguments(allocate)
+    allocate.add_argument("--resources", action="store", nargs="+", dest="resources",
+                          required=True, help="Resources amongst which allocate the tasks")
+    allocate.add_argument("--resource-exclude", action="store", nargs="+", dest="resource_exclude", required=False,
+                          default=[], help="Non-working days of a single resource in the RESOURCE=YYYY-mm-dd format")
+    allocate.add_argument("--capacity", action="store", nargs="+", dest="capacity", required=False,
+                          default=[], help="Number of tasks a resource can work on in parallel in the RESOURCE=K format (default 1)")
+    add_output_arguments(
+        allocate, "Above this number of tasks, show one bar for every period in which a resource is busy")
+    add_source_arguments(allocate)
+    add_schedule_arguments(allocate)
+    allocate.add_argument("--strategy", action="store", dest="strategy", choices=["greedy", "longest-path"], required=False,
+                          default="greedy", help="Order in which tasks are allocated: as they become unblocked, or the unblocked task with the longest path to the end first (default greedy)")
+    allocate.add_argument("--optimize-seconds", action="store", dest="optimize_seconds", required=False,
+                          help="Improve the allocation of the strategy with a local search for up to this many seconds, reporting the makespan against the greedy allocation")
+    allocate.add_argument("--optimize-iterations", action="store", dest="optimize_iterations", required=False,
+                          help="Stop the local search after this many iterations, so that runs with the same seed give the same allocation")
+    allocate.add_argument("--seed", action="store", dest="seed", required=False, default=0,
+                          help="Seed of the local search (default 0), the allocation only depends on the seed when --optimize-iterations is given as well, "
+                          "otherwise the number of steps depends on the speed of the machine")
+    add_instrumentation_arguments(allocate)
+    add_query_argument(allocate)
+    allocate.set_defaults(run=run_allocate)
+    serve = commands.add_parser(
+        "serve", help="HTTP service planning JQL queries on request, keeping the issues of every query in memory")
+    serve.add_argument("--host", action="store", dest="host", required=False, default="127.0.0.1",
+                       help="Address the service listens on (default 127.0.0.1)")
+    serve.add_argument("--port", action="store", dest="port", required=False, default=8080,
+                       help="Port the service listens on (default 8080)")
+    serve.add_argument("--refresh-seconds", action="store", dest="refresh_seconds", required=False, default=300,
+                       help="Seconds between the syncs of the issues of every query with Jira, results of queries with changed issues are computed again (default 300)")
+    serve.add_argument("--results", action="store", dest="results", required=False, default=128,
+                       help="Number of computed timelines kept in memory (default 128)")
+    serve.add_argument("--day-duration", action="store", dest="day_duration",
+                       required=False, default=8, help="Workday duration in hours")
+    add_jira_arguments(serve, required=True)
+    serve.set_defaults(run=run_serve, input_file=None, export_file=None, refresh=False, offline=False,
+                       stats_json=None, profile=None)
+    arg = p.parse_args(argv)
+    command = commands.choices[arg.command]
+    if arg.command == "serve":
+        return arg
+    check_source_arguments(command, arg)
+    if arg.command == "gantt" and arg.simulations:
+        from forecast import DISTRIBUTIONS
+        if arg.distribution not in DISTRIBUTIONS:
+            command.error(f"argument --distribution: invalid choice: '{arg.distribution}' "
+                          f"(choose from {', '.join(DISTRIBUTIONS)})")
+    return arg
+
+
+def add_calendar_arguments(p: argparse.ArgumentParser):
+    p.add_argument("--exclude", action="store", nargs="+", dest="exclude", required=False,
+                   default=[], help="Dates in the YYYY-mm-dd format for non-working days")
+    p.add_argument("--holiday-weekday", action="store", nargs="+", dest="holiday_weekday",
+                   required=False, default=[5, 6], help="Non working days of the week (0 for Monday, 6 for Sunday)")
+    p.add_argument("--start-date", action="store", dest="start_date", required=True,
+                   help="Start date in the YYYY-mm-dd format from which to start computing the Gantt")
+
+
+def add_output_arguments(p: argparse.ArgumentParser, collapse_help: str):
+    p.add_argument("--output", action="store", dest="output", required=False, default="gantt",
+                   help="Filename (without extension) where the Gantt chart will be saved")
+    p.add_argument("--format", action="store", dest="format", choices=FORMATS, required=False, default="html",
+                   help="Format of the output: interactive chart, static image or tasks as CSV, JSON or iCalendar events (default html)")
+    p.add_argument("--html-mode", action="store", dest="html_mode", choices=HTML_MODES, required=False, default="inline",
+                   help="Embed plotly.js in the HTML chart, load it from a CDN, or load it from a CDN and draw the bars with WebGL (default inline)")
+    p.add_argument("--collapse-above", action="store", dest="collapse_above", required=False,
+                   help=collapse_help)
+
+
+def add_source_arguments(p: argparse.ArgumentParser):
+    add_jira_arguments(p, required=False)
+    p.add_argument("--input-file", action="store", dest="input_file", required=False,
+                   help="JSON Lines, CSV or Parquet file to read the tasks from instead of Jira")
+    p.add_argument("--export-file", action="store", dest="export_file", required=False,
+                   help="JSON Lines, CSV or Parquet file where the tasks fetched from Jira are saved")
+    p.add_argument("--refresh", action="store_true", dest="refresh", required=False,
+                   help="Fetch all the issues even if they are cached")
+    p.add_argument("--offline", action="store_true", dest="offline", required=False,
+                   help="Use the cached issues without connecting to Jira")
+
+
+def add_jira_arguments(p: argparse.ArgumentParser, required: bool):
+    p.add_argument("--user", action="store", dest="user",
+                   required=required, help="User to use to authenticate to Jira" + ("" if required else " (required unless --offline)"))
+    p.add_argument("--password", action="store", dest="password",
+                   required=required, help="Password to use to authenticate to Jira" + ("" if required else " (required unless --offline)"))
+    p.add_argument("--dependency-types", action="store", nargs="+", dest="dependency_types",
+                   required=False, default=['Blocks'], help="Forward dependency that indicates a blocking link")
+    p.add_argument("--jira-url", action="store", dest="jira_url",
+                   required=required, help="URL for the Jira server to connect to")
+    p.add_argument("--page-size", action="store", dest="page_size",
+                   required=False, default=100, help="Number of issues requested to Jira per page (default 100)")
+    p.add_argument("--concurrency", action="store", dest="concurrency",
+                   required=False, default=4, help="Maximum number of pages fetched from Jira in parallel (default 4)")
+    p.add_argument("--crawl-depth", action="store", dest="crawl_depth", required=False, default=0,
+                   help="Also fetch issues outside the JQL query linked by a dependency, following links up to this depth (default 0, disabled)")
+    p.add_argument("--crawl-budget", action="store", dest="crawl_budget", required=False,
+                   help="Maximum number of issues outside the JQL query fetched when following dependencies")
+    p.add_argument("--cache-dir", action="store", dest="cache_dir", required=False,
+                   help="Directory where issues are cached between runs, only issues changed since the previous run are fetched")
+
+
+def add_schedule_arguments(p: argparse.ArgumentParser):
+    p.add_argument("--day-duration", action="store", dest="day_duration",
+                   required=False, default=8, help="Workday duration in hours")
+    p.add_argument("--mode", action="store", dest="mode",
+                   choices=["original", "remaining"], required=False, default="original", help="Use original estimate or remaining estimate (default original)")
+    p.add_argument("--critical-path", action="store_true", dest="critical_path", required=False,
+                   help="Highlight the tasks on the critical path of the dependencies and show the float of every task")
+
+
+def add_instrumentation_arguments(p: argparse.ArgumentParser):
+    p.add_argument("--stats-json", action="store", dest="stats_json", required=False,
+                   help="JSON file where the seconds spent in every phase, counters of the scheduling work and the peak memory are saved")
+    p.add_argument("--profile", action="store", dest="profile", required=False,
+                   help="File where a cProfile dump of the run is saved, to read with pstats or snakeviz")
+
+
+def add_query_argument(p: argparse.ArgumentParser):
+    p.add_argument(
+        "jira_query", nargs="?", help="JQL query that returns all Jira tickets to add to the Gantt calculation")
+
+
+def check_source_arguments(p: argparse.ArgumentParser, arg):
+    if bool(arg.jira_url) == bool(arg.input_file):
+        p.error("exactly one of --jira-url and --input-file is required")
+    if arg.input_file:
+        if arg.export_file:
+            p.error("--export-file only saves tasks fetched from Jira, it cannot be used with --input-file")
+        return
+    if not arg.jira_query:
+        p.error("the jira_query argument is required with --jira-url")
+    if arg.offline and not arg.cache_dir:
+        p.error("--offline requires --cache-dir")
+    if not arg.offline and not (arg.user and arg.password):
+        p.error("--user and --password are required unless --offline is used")
+
+
+def make_timeline_calculator(start_date: str,
+                             day_duration: float,
+                             excluded_dates: List[str],
+                             holiday_weekday: List[str],
+                             resource_excluded_dates: Sequence[str] = (),
+                             stats: Optional[RunStats] = None) -> TimelineCalculator:
+    parsed_start_date = parse_date(start_date)
+    parsed_excluded_dates = list(
+        map(lambda d: parse_date(d.strip()), excluded_dates))
+    parsed_holiday_weekday = list(map(lambda d: int(d), holiday_weekday))
+    parsed_resource_excluded_dates = {}
+    for resource_excluded_date in resource_excluded_dates:
+        resource, _, excluded_date = resource_excluded_date.rpartition("=")
+        parsed_resource_excluded_dates.setdefault(resource, []).append(
+            parse_date(excluded_date.strip()))
+    return TimelineCalculator(
+        parsed_start_date, day_duration, parsed_excluded_dates, parsed_holiday_weekday, parsed_resource_excluded_dates,
+        stats)
+
+
+def parse_capacities(capacities: List[str]) -> Dict[str, int]:
+    parsed_capacities = {}
+    for capacity in capacities:
+        resource, _, parallel_tasks = capacity.rpartition("=")
+        parsed_capacities[resource] = int(parallel_tasks)
+    return parsed_capacities
+
+
+def make_repository(tasks: List[Task]) -> TaskRepository:
+    task_repository = CompactTaskRepository()
+    for task in tasks:
+        task_repository.save(task)
+    return task_repository
+
+
+def parse_date(string_date: str) -> date:
+    return datetime.strptime(string_date, "%Y-%m-%d").date()
+
+
+def make_gantt(timeline_tasks: List[TimelineTask], output: str,
+               critical_path: Optional[List["CriticalPathTask"]] = None,
+               forecast: Optional["Forecast"] = None,
+               file_format: str = "html", html_mode: str = "inline",
+               groups: Optional[Dict[str, str]] = None):
+    columns, chart = gantt_chart(
+        timeline_tasks, critical_path, forecast, groups)
+    render(columns, chart, output, file_format, html_mode)
+
+
+def gantt_chart(timeline_tasks: List[TimelineTask],
+                critical_path: Optional[List["CriticalPathTask"]] = None,
+                forecast: Optional["Forecast"] = None,
+                groups: Optional[Dict[str, str]] = None) -> Tuple[Columns, Chart]:
+    columns = timeline_columns(timeline_tasks)
+    chart = Chart(y="JiraID", hover=["Summary", "JiraID", "Link"], reverse_y=True)
+    if forecast is not None:
+        forecast_tasks = {task.code: task for task in forecast.tasks}
+        for percentile in forecast.project_end:
+            columns[f"P{percentile}"] = [forecast_tasks[task.code].end[percentile]
+                                         for task in timeline_tasks]
+            chart.hover.append(f"P{percentile}")
+    if critical_path is not None:
+        critical_tasks = {task.code: task for task in critical_path}
+        critical = [critical_tasks[task.code] for task in timeline_tasks]
+        columns["Critical"] = ["Critical" if task.critical else "Not critical"
+                               for task in critical]
+        columns["Float"] = [task.total_float for task in critical]
+        columns["LatestStart"] = [task.latest_start for task in critical]
+        columns["LatestEnd"] = [task.latest_end for task in critical]
+        chart.hover += ["Float", "LatestStart", "LatestEnd"]
+        chart.color = "Critical"
+        chart.color_map = {"Critical": "crimson",
+                           "Not critical": "steelblue"}
+    if groups is not None:
+        return collapse(columns, chart, [groups[task.code] for task in timeline_tasks])
+    return columns, chart
+
+
+def dependency_groups(task_repository: TaskRepository) -> Dict[str, str]:
+    # Every task is in the group of the tasks linked to it by dependencies,
+    # named after the first of them.
+    dependency_graph = task_repository.dependency_graph()
+    groups = {}
+    for component in dependency_graph.weakly_connected_components():
+        name = dependency_graph.codes[component[0]]
+        if len(component) > 1:
+            name = f"{name} and {len(component) - 1} linked"
+        for index in component:
+            groups[dependency_graph.codes[index]] = name
+    return groups
+
+
+def make_timeline(timeline_tasks: List[TimelineTaskWithResource], output: str,
+                  critical_path: Optional[List["CriticalPathTask"]] = None,
+                  file_format: str = "html", html_mode: str = "inline", collapse_above: Optional[int] = None):
+    columns, chart = allocation_chart(
+        timeline_tasks, critical_path, collapse_above)
+    render(columns, chart, output, file_format, html_mode)
+
+
+def allocation_chart(timeline_tasks: List[TimelineTaskWithResource],
+                     critical_path: Optional[List["CriticalPathTask"]] = None,
+                     collapse_above: Optional[int] = None) -> Tuple[Columns, Chart]:
+    columns = timeline_columns(timeline_tasks, with_resource=True)
+    chart = Chart(y="Resource", hover=[
+                  "Summary", "JiraID", "Link"], color="Resource")
+    if critical_path is not None:
+        # Critical tasks are outlined, the colour still tells the resource.
+        critical_tasks = {task.code: task for task in critical_path}
+        columns["Critical"] = [critical_tasks[task.code].critical
+                               for task in timeline_tasks]
+        columns["Float"] = [critical_tasks[task.code].total_float
+                            for task in timeline_tasks]
+        chart.hover += ["Critical", "Float"]
+        chart.outline = "Critical"
+    if collapse_above is not None and len(timeline_tasks) > collapse_above:
+        return collapse(columns, chart, columns["Resource"])
+    return columns, chart
+
+
+if __name__ == "__main__":
+    main()
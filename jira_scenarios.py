@@ -0,0 +1,239 @@
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from datetime import date
+from itertools import product
+from jira_cli import add_source_arguments, check_source_arguments, fetch_tasks, make_repository, make_timeline, parse_date
+from task_files import iter_tasks
+from tasks import Task, TaskRepository, TimelineCalculator
+from typing import Dict, List, Optional, Tuple
+from working_calendar import WorkingCalendar
+import argparse
+import csv
+import os
+import sys
+
+MODES = ["original", "remaining"]
+TABLE_COLUMNS = ["Scenario", "Resources", "Mode", "Start", "Holidays",
+                 "End", "Makespan", "DependencyEnd", "Utilization"]
+
+
+@dataclass
+class Scenario:
+    number: int
+    resources: List[str]
+    mode: str
+    start_date: date
+    holidays: str
+    excluded_dates: List[date]
+
+
+@dataclass
+class ScenarioResult:
+    scenario: Scenario
+    end: date
+    # Working days from the start date to the end of the last task.
+    makespan: int
+    # End of the last task with unlimited resources.
+    dependency_end: date
+    # Share of the working days of the resources spent on tasks.
+    utilization: float
+
+
+def main():
+    arg = parser()
+    if arg.input_file:
+        tasks = list(iter_tasks(arg.input_file))
+    else:
+        tasks = fetch_tasks(arg)
+    scenarios = make_scenarios(arg)
+    results = run_scenarios(tasks, scenarios, float(arg.day_duration), list(map(int, arg.holiday_weekday)),
+                            int(arg.workers), arg.charts_dir)
+    print_table(results, sys.stdout)
+    if arg.table_file:
+        with open(arg.table_file, "w", newline="") as f:
+            write_table(results, f)
+
+
+def parser():
+    p = argparse.ArgumentParser(
+        description="Compares the resource allocation of the same tasks over a grid of scenarios")
+    p.add_argument("--resource-counts", action="store", nargs="+", dest="resource_counts", required=True,
+                   help="Numbers of resources amongst which allocate the tasks, one scenario each")
+    p.add_argument("--resources", action="store", nargs="+", dest="resources", required=False, default=[],
+                   help="Names of the resources, the first ones are used for every count (default resource-1, resource-2, ...)")
+    p.add_argument("--modes", action="store", nargs="+", dest="modes", choices=MODES, required=False,
+                   default=MODES, help="Use original estimate, remaining estimate or both (default both)")
+    p.add_argument("--start-dates", action="store", nargs="+", dest="start_dates", required=True,
+                   help="Start dates in the YYYY-mm-dd format, one scenario each")
+    p.add_argument("--holiday-sets", action="store", nargs="+", dest="holiday_sets", required=False, default=[""],
+                   help="Sets of comma separated dates in the YYYY-mm-dd format for non-working days, one scenario each")
+    p.add_argument("--exclude", action="store", nargs="+", dest="exclude", required=False,
+                   default=[], help="Dates in the YYYY-mm-dd format for non-working days in every scenario")
+    p.add_argument("--holiday-weekday", action="store", nargs="+", dest="holiday_weekday",
+                   required=False, default=[5, 6], help="Non working days of the week (0 for Monday, 6 for Sunday)")
+    p.add_argument("--day-duration", action="store", dest="day_duration",
+                   required=False, default=8, help="Workday duration in hours")
+    p.add_argument("--workers", action="store", dest="workers", required=False, default=os.cpu_count() or 1,
+                   help="Number of processes running the scenarios (default the number of CPUs, 0 to run them in this process)")
+    p.add_argument("--charts-dir", action="store", dest="charts_dir", required=False,
+                   help="Directory where the resource allocation timeline of every scenario is saved")
+    p.add_argument("--table-file", action="store", dest="table_file", required=False,
+                   help="CSV file where the comparison table is saved")
+    add_source_arguments(p)
+    p.add_argument(
+        "jira_query", nargs="?", help="JQL query that returns all Jira tickets to plan")
+    arg = p.parse_args()
+    check_source_arguments(p, arg)
+    if arg.resources and len(arg.resources) < max(map(int, arg.resource_counts)):
+        p.error("--resources must name at least as many resources as the largest of --resource-counts")
+    return arg
+
+
+def make_scenarios(arg) -> List[Scenario]:
+    excluded_dates = [parse_date(d.strip()) for d in arg.exclude]
+    scenarios = []
+    for count, mode, start_date, holidays in product(map(int, arg.resource_counts), arg.modes, arg.start_dates,
+                                                     arg.holiday_sets):
+        resources = arg.resources[:count] if arg.resources else [
+            f"resource-{i + 1}" for i in range(count)]
+        scenarios.append(Scenario(number=len(scenarios) + 1,
+                                  resources=resources,
+                                  mode=mode,
+                                  start_date=parse_date(start_date),
+                                  holidays=holidays,
+                                  excluded_dates=excluded_dates + [parse_date(d.strip()) for d in holidays.split(",") if d.strip()]))
+    return scenarios
+
+
+def run_scenarios(tasks: List[Task], scenarios: List[Scenario], hours_in_day: float, skipped_weekdays: List[int],
+                  workers: int, charts_dir: Optional[str] = None) -> List[ScenarioResult]:
+    # Every worker process parses the tasks once. Allocations need the whole
+    # task set, since the resources are shared by all tasks, but the end
+    # with unlimited resources is computed independently for every group of
+    # weakly connected tasks, and only once for scenarios differing only in
+    # their resources.
+    if charts_dir:
+        os.makedirs(charts_dir, exist_ok=True)
+    repository = make_repository(tasks)
+    component_batches = _component_batches(repository, max(workers, 1))
+    calendars = list(dict.fromkeys((scenario.mode, scenario.start_date, tuple(scenario.excluded_dates))
+                                   for scenario in scenarios))
+    allocation_jobs = [(scenario, hours_in_day, skipped_weekdays, charts_dir)
+                       for scenario in scenarios]
+    dependency_jobs = [(calendar, hours_in_day, skipped_weekdays, codes)
+                       for calendar in calendars for codes in component_batches]
+    if workers > 0:
+        with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(tasks,)) as executor:
+            allocations = executor.map(_allocate, *zip(*allocation_jobs))
+            dependency_ends = list(executor.map(_dependency_end, *zip(*dependency_jobs))) if dependency_jobs else []
+            allocations = list(allocations)
+    else:
+        _init_worker(tasks)
+        allocations = [_allocate(*job) for job in allocation_jobs]
+        dependency_ends = [_dependency_end(*job) for job in dependency_jobs]
+    end_by_calendar: Dict[Tuple, date] = {}
+    for (calendar, *_), end in zip(dependency_jobs, dependency_ends):
+        end_by_calendar[calendar] = max(end, end_by_calendar.get(calendar, end))
+    results = []
+    for scenario, (end, makespan, utilization) in zip(scenarios, allocations):
+        calendar = (scenario.mode, scenario.start_date,
+                    tuple(scenario.excluded_dates))
+        results.append(ScenarioResult(scenario=scenario,
+                                      end=end,
+                                      makespan=makespan,
+                                      dependency_end=end_by_calendar.get(
+                                          calendar, scenario.start_date),
+                                      utilization=utilization))
+    return results
+
+
+def _component_batches(repository: TaskRepository, count: int) -> List[List[str]]:
+    # Weakly connected components spread over count batches of similar size,
+    # largest first.
+    dependency_graph = repository.dependency_graph()
+    components = sorted(dependency_graph.weakly_connected_components(),
+                        key=len, reverse=True)
+    batches = [[] for _ in range(min(count, len(components)))]
+    for component in components:
+        min(batches, key=len).extend(dependency_graph.codes[index]
+                                     for index in component)
+    return batches
+
+
+_worker_repository: Optional[TaskRepository] = None
+
+
+def _init_worker(tasks: List[Task]):
+    global _worker_repository
+    _worker_repository = make_repository(tasks)
+
+
+def _allocate(scenario: Scenario, hours_in_day: float, skipped_weekdays: List[int],
+              charts_dir: Optional[str]) -> Tuple[date, int, float]:
+    timeline_calculator = TimelineCalculator(
+        scenario.start_date, hours_in_day, scenario.excluded_dates, skipped_weekdays)
+    if scenario.mode == "original":
+        timeline_tasks = timeline_calculator.compute_original_resource_allocation(
+            _worker_repository, scenario.resources)
+    else:
+        timeline_tasks = timeline_calculator.compute_remaining_resource_allocation(
+            _worker_repository, scenario.resources)
+    if charts_dir:
+        make_timeline(timeline_tasks, os.path.join(
+            charts_dir, f"scenario-{scenario.number}"))
+    calendar = WorkingCalendar(
+        scenario.start_date, scenario.excluded_dates, skipped_weekdays)
+    end = max((task.end for task in timeline_tasks),
+              default=scenario.start_date)
+    makespan = calendar.working_days_between(scenario.start_date, end)
+    busy = sum(calendar.working_days_between(task.start, task.end)
+               for task in timeline_tasks)
+    utilization = busy / (makespan * len(scenario.resources)) if makespan else 0
+    return end, makespan, utilization
+
+
+def _dependency_end(calendar: Tuple, hours_in_day: float, skipped_weekdays: List[int], codes: List[str]) -> date:
+    mode, start_date, excluded_dates = calendar
+    repository = TaskRepository()
+    for code in codes:
+        repository.save(_worker_repository.get(code))
+    timeline_calculator = TimelineCalculator(
+        start_date, hours_in_day, list(excluded_dates), skipped_weekdays)
+    if mode == "original":
+        timeline_tasks = timeline_calculator.compute_original_timeline(
+            repository)
+    else:
+        timeline_tasks = timeline_calculator.compute_remaining_timeline(
+            repository)
+    return max((task.end for task in timeline_tasks), default=start_date)
+
+
+def _table_rows(results: List[ScenarioResult]) -> List[List[str]]:
+    return [[str(result.scenario.number),
+             str(len(result.scenario.resources)),
+             result.scenario.mode,
+             result.scenario.start_date.strftime("%Y-%m-%d"),
+             result.scenario.holidays or "-",
+             result.end.strftime("%Y-%m-%d"),
+             str(result.makespan),
+             result.dependency_end.strftime("%Y-%m-%d"),
+             f"{result.utilization:.1%}"] for result in results]
+
+
+def print_table(results: List[ScenarioResult], output):
+    rows = [TABLE_COLUMNS] + _table_rows(results)
+    widths = [max(len(row[column]) for row in rows)
+              for column in range(len(TABLE_COLUMNS))]
+    for row in rows:
+        print("  ".join(value.ljust(width)
+                        for value, width in zip(row, widths)).rstrip(), file=output)
+
+
+def write_table(results: List[ScenarioResult], output):
+    writer = csv.writer(output)
+    writer.writerow(TABLE_COLUMNS)
+    writer.writerows(_table_rows(results))
+
+
+if __name__ == "__main__":
+    main()
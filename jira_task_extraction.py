@@ -1,28 +1,182 @@
-from jira import JIRA
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
 from tasks import Task
-from typing import List
-
-
-def extract_tasks_from_search(user: str, password: str, jira_url: str, search: str, dependency_types: List[str]) -> List[Task]:
-    jira = JIRA(jira_url, auth=(user, password))
-    issues = jira.search_issues(search)
-    tasks = []
-    for issue in issues:
-        hours = (
-            issue.fields.timeoriginalestimate if issue.fields.timeoriginalestimate else 0) / 3600
-        remaining = (
-            issue.fields.timeestimate if issue.fields.timeestimate else 0) / 3600
-        code = issue.key
-        description = issue.fields.summary
-        block_list = []
-        for link in issue.fields.issuelinks:
-            if link.type.name in dependency_types:
-                if hasattr(link, "outwardIssue"):
-                    block_list.append(link.outwardIssue.key)
-        tasks.append(Task(code=code,
-                          blocks=block_list,
-                          description=description,
-                          original_estimate_hours=hours,
-                          remaining_estimate_hours=remaining,
-                          link=f"{jira_url}/browse/{code}"))
-    return tasks
+from typing import List, Optional, Set, Tuple
+import re
+import time
+import requests
+from requests.adapters import HTTPAdapter
+
+TASK_FIELDS = ["summary", "timeoriginalestimate", "timeestimate", "issuelinks"]
+_ORDER_BY = re.compile(r"\s*\border\s+by\b.*$", re.IGNORECASE | re.DOTALL)
+
+
+@dataclass
+class FetchStats:
+    issues: int = 0
+    pages: int = 0
+    bytes: int = 0
+    elapsed_seconds: float = 0
+
+    def add_transfer(self, other: "FetchStats"):
+        self.issues += other.issues
+        self.pages += other.pages
+        self.bytes += other.bytes
+
+    def __str__(self):
+        return f"Fetched {self.issues} issues in {self.pages} pages ({self.bytes} bytes) in {self.elapsed_seconds:.2f}s"
+
+
+def extract_tasks_from_search(user: str, password: str, jira_url: str, search: str, dependency_types: List[str],
+                              page_size: int = 100, concurrency: int = 4, stats: Optional[FetchStats] = None,
+                              crawl_depth: int = 0, crawl_budget: Optional[int] = None) -> List[Task]:
+    session = make_session(user, password, concurrency)
+    issues = search_issues(session, jira_url, search,
+                           TASK_FIELDS, page_size, concurrency, stats)
+    if crawl_depth:
+        issues.extend(crawl_linked_issues(session, jira_url, {issue["key"] for issue in issues},
+                                          [key for issue in issues for key in linked_keys(
+                                              issue, dependency_types)],
+                                          dependency_types, page_size, concurrency, crawl_depth, crawl_budget, stats))
+    return [issue_to_task(issue, jira_url, dependency_types) for issue in issues]
+
+
+def make_session(user: str, password: str, concurrency: int) -> requests.Session:
+    session = requests.Session()
+    session.auth = (user, password)
+    session.headers.update({"Accept": "application/json"})
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=concurrency)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def search_issues(session: requests.Session, jira_url: str, search: str, fields: List[str],
+                  page_size: int, concurrency: int, stats: Optional[FetchStats] = None,
+                  validate_query: bool = True) -> List[dict]:
+    # The first page tells how many issues match and how many the server
+    # returns per page (it may cap page_size), the remaining pages are then
+    # fetched concurrently and concatenated in order.
+    started = time.perf_counter()
+    stats = stats if stats is not None else FetchStats()
+    first_page, first_page_bytes = _fetch_page(
+        session, jira_url, search, fields, 0, page_size, validate_query)
+    pages = [(first_page, first_page_bytes)]
+    stride = first_page.get("maxResults", 0)
+    total = first_page.get("total", 0)
+    if stride and total > stride:
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            pages.extend(executor.map(lambda start_at: _fetch_page(session, jira_url, search, fields, start_at, stride, validate_query),
+                                      range(stride, total, stride)))
+    issues = []
+    for page, page_bytes in pages:
+        issues.extend(page.get("issues", []))
+        stats.pages += 1
+        stats.bytes += page_bytes
+    stats.issues += len(issues)
+    stats.elapsed_seconds += time.perf_counter() - started
+    return issues
+
+
+def search_issues_by_keys(session: requests.Session, jira_url: str, keys: List[str], fields: List[str],
+                          page_size: int, concurrency: int, stats: Optional[FetchStats] = None) -> List[dict]:
+    # Keys are looked up in batches of page_size with "key in (...)" queries
+    # run concurrently. Keys that no longer exist are skipped rather than
+    # failing the whole batch.
+    started = time.perf_counter()
+    stats = stats if stats is not None else FetchStats()
+    batches = [keys[start:start + page_size]
+               for start in range(0, len(keys), page_size)]
+    batches_stats = [FetchStats() for _ in batches]
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(lambda batch, batch_stats: search_issues(session, jira_url, keys_search(batch), fields,
+                                                                             page_size, 1, batch_stats, validate_query=False),
+                                    batches, batches_stats))
+    for batch_stats in batches_stats:
+        stats.add_transfer(batch_stats)
+    stats.elapsed_seconds += time.perf_counter() - started
+    return [issue for result in results for issue in result]
+
+
+def crawl_linked_issues(session: requests.Session, jira_url: str, seen: Set[str], linked: List[str], dependency_types: List[str],
+                        page_size: int, concurrency: int, max_depth: int, max_issues: Optional[int] = None,
+                        stats: Optional[FetchStats] = None) -> List[dict]:
+    # Breadth-first walk of the dependency links starting from the linked
+    # keys: every wave fetches the keys not seen yet, up to max_depth waves
+    # and max_issues issues in total, and collects the next wave from the
+    # links of the issues it fetched.
+    crawled = []
+    wave = _unseen(linked, seen)
+    depth = 0
+    while wave and depth < max_depth:
+        if max_issues is not None:
+            wave = wave[:max_issues - len(crawled)]
+        issues = search_issues_by_keys(
+            session, jira_url, wave, TASK_FIELDS, page_size, concurrency, stats)
+        crawled.extend(issues)
+        depth += 1
+        wave = _unseen([key for issue in issues for key in linked_keys(
+            issue, dependency_types)], seen)
+    return crawled
+
+
+def _unseen(keys: List[str], seen: Set[str]) -> List[str]:
+    unseen = []
+    for key in keys:
+        if key not in seen:
+            seen.add(key)
+            unseen.append(key)
+    return unseen
+
+
+def linked_keys(issue: dict, dependency_types: List[str]) -> List[str]:
+    keys = []
+    for link in issue["fields"].get("issuelinks") or []:
+        if link["type"]["name"] in dependency_types:
+            for direction in ("outwardIssue", "inwardIssue"):
+                if direction in link:
+                    keys.append(link[direction]["key"])
+    return keys
+
+
+def restrict_search(search: str, clause: str) -> str:
+    order_by = _ORDER_BY.search(search)
+    condition = search[:order_by.start()] if order_by else search
+    ordering = f" {order_by.group(0).strip()}" if order_by else ""
+    if not condition.strip():
+        return f"{clause}{ordering}"
+    return f"({condition}) AND {clause}{ordering}"
+
+
+def keys_search(keys: List[str]) -> str:
+    return "key in ({})".format(", ".join(f'"{key}"' for key in keys))
+
+
+def _fetch_page(session: requests.Session, jira_url: str, search: str, fields: List[str],
+                start_at: int, max_results: int, validate_query: bool) -> Tuple[dict, int]:
+    response = session.post(f"{jira_url.rstrip('/')}/rest/api/2/search",
+                            json={"jql": search,
+                                  "startAt": start_at,
+                                  "maxResults": max_results,
+                                  "fields": fields,
+                                  "validateQuery": validate_query})
+    response.raise_for_status()
+    return response.json(), len(response.content)
+
+
+def issue_to_task(issue: dict, jira_url: str, dependency_types: List[str]) -> Task:
+    fields = issue["fields"]
+    hours = (fields.get("timeoriginalestimate") or 0) / 3600
+    remaining = (fields.get("timeestimate") or 0) / 3600
+    code = issue["key"]
+    block_list = []
+    for link in fields.get("issuelinks") or []:
+        if link["type"]["name"] in dependency_types:
+            if "outwardIssue" in link:
+                block_list.append(link["outwardIssue"]["key"])
+    return Task(code=code,
+                blocks=block_list,
+                description=fields.get("summary"),
+                original_estimate_hours=hours,
+                remaining_estimate_hours=remaining,
+                link=f"{jira_url}/browse/{code}")
@@ -0,0 +1,268 @@
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from datetime import date
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from jira_cli import allocation_chart, gantt_chart, make_repository, parse_date
+from rendering import render_text
+from tasks import Task, TaskRepository, TimelineCalculator, TimelineTask
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+import json
+import sys
+import threading
+
+CONTENT_TYPES = {"html": "text/html; charset=utf-8",
+                 "json": "application/json",
+                 "csv": "text/csv; charset=utf-8",
+                 "ics": "text/calendar; charset=utf-8"}
+
+
+@dataclass(frozen=True)
+class PlanRequest:
+    query: str
+    mode: str
+    start_date: date
+    # Excluded dates and non-working days of the week.
+    calendar: Tuple[Tuple[date, ...], Tuple[int, ...]]
+    # Empty for the timeline with unlimited resources.
+    resources: Tuple[str, ...] = ()
+
+
+@dataclass
+class ServiceStats:
+    hits: int = 0
+    misses: int = 0
+    syncs: int = 0
+    # Refreshes that found changed issues and dropped the results of a query.
+    invalidations: int = 0
+
+
+@dataclass
+class _QueryState:
+    tasks: List[Task]
+    # Only read once synced, so shared by the computations of the query.
+    repository: TaskRepository
+
+
+@dataclass
+class _CalculatorState:
+    calculator: TimelineCalculator
+    # Calendars grow on demand, so a calculator computes one timeline at a
+    # time.
+    lock: threading.Lock
+
+
+class PlanningService:
+    # Keeps the issues of every JQL query in a repository, synced on the
+    # first request for the query and then on every refresh, a calculator
+    # per calendar and the computed timelines in an LRU keyed by request.
+    # The timelines of a query are dropped when a refresh finds that its
+    # issues changed. Timelines with different calendars are computed
+    # concurrently.
+
+    def __init__(self, sync: Callable[[str], List[Task]], hours_in_day: float = 8, results: int = 128):
+        self._sync = sync
+        self._hours_in_day = hours_in_day
+        self._size = results
+        self._queries: Dict[str, _QueryState] = {}
+        self._results: "OrderedDict[PlanRequest, List[TimelineTask]]" = OrderedDict()
+        self._calculators: "OrderedDict[Tuple, _CalculatorState]" = OrderedDict()
+        self._lock = threading.Lock()
+        # Syncs share the issue cache.
+        self._sync_lock = threading.Lock()
+        self.stats = ServiceStats()
+
+    def timeline(self, request: PlanRequest) -> List[TimelineTask]:
+        with self._lock:
+            timeline_tasks = self._results.get(request)
+            if timeline_tasks is not None:
+                self._results.move_to_end(request)
+                self.stats.hits += 1
+                return timeline_tasks
+            self.stats.misses += 1
+        state = self._query(request.query)
+        calculator_state = self._calculator(request.start_date, request.calendar)
+        with calculator_state.lock:
+            calculator = calculator_state.calculator
+            if not request.resources:
+                if request.mode == "original":
+                    timeline_tasks = calculator.compute_original_timeline(
+                        state.repository)
+                else:
+                    timeline_tasks = calculator.compute_remaining_timeline(
+                        state.repository)
+            elif request.mode == "original":
+                timeline_tasks = calculator.compute_original_resource_allocation(
+                    state.repository, list(request.resources))
+            else:
+                timeline_tasks = calculator.compute_remaining_resource_allocation(
+                    state.repository, list(request.resources))
+        with self._lock:
+            # Not kept if a refresh changed the issues in the meantime.
+            if self._queries.get(request.query) is state:
+                self._results[request] = timeline_tasks
+                if len(self._results) > self._size:
+                    self._results.popitem(last=False)
+        return timeline_tasks
+
+    def refresh(self) -> List[str]:
+        # Syncs the issues of every query, returns the queries whose issues
+        # changed.
+        with self._lock:
+            queries = list(self._queries)
+        changed = []
+        for query in queries:
+            with self._sync_lock:
+                tasks = self._sync(query)
+            with self._lock:
+                self.stats.syncs += 1
+                unchanged = tasks == self._queries[query].tasks
+            if unchanged:
+                continue
+            state = _QueryState(tasks, make_repository(tasks))
+            with self._lock:
+                self._queries[query] = state
+                for request in [request for request in self._results if request.query == query]:
+                    del self._results[request]
+                self.stats.invalidations += 1
+            changed.append(query)
+        return changed
+
+    def summary(self) -> dict:
+        with self._lock:
+            return dict(asdict(self.stats), queries=len(self._queries), results=len(self._results))
+
+    def _query(self, query: str) -> _QueryState:
+        with self._lock:
+            state = self._queries.get(query)
+        if state is not None:
+            return state
+        with self._sync_lock:
+            with self._lock:
+                state = self._queries.get(query)
+            if state is None:
+                tasks = self._sync(query)
+                state = _QueryState(tasks, make_repository(tasks))
+                with self._lock:
+                    self._queries[query] = state
+                    self.stats.syncs += 1
+        return state
+
+    def _calculator(self, start_date: date, calendar: Tuple) -> _CalculatorState:
+        key = (start_date, calendar)
+        with self._lock:
+            state = self._calculators.get(key)
+            if state is None:
+                excluded_dates, holiday_weekdays = calendar
+                state = _CalculatorState(TimelineCalculator(start_date, self._hours_in_day, list(excluded_dates),
+                                                            list(holiday_weekdays)),
+                                         threading.Lock())
+                self._calculators[key] = state
+                if len(self._calculators) > self._size:
+                    self._calculators.popitem(last=False)
+            else:
+                self._calculators.move_to_end(key)
+        return state
+
+
+def parse_request(path: str, params: Dict[str, List[str]]) -> Tuple[PlanRequest, str, str]:
+    # Requests for /gantt or /allocate with the JQL query, the start date and
+    # optionally the calendar, the mode and the output. Raises ValueError for
+    # invalid parameters.
+    def param(name: str, default: Optional[str] = None) -> str:
+        value = params.get(name, [default])[-1]
+        if value is None:
+            raise ValueError(f"Missing parameter {name}")
+        return value
+
+    def values(name: str, default: str = "") -> List[str]:
+        return [value.strip() for value in param(name, default).split(",") if value.strip()]
+
+    mode = param("mode", "original")
+    if mode not in ("original", "remaining"):
+        raise ValueError(f"Unknown mode {mode}, expected original or remaining")
+    file_format = param("format", "html")
+    if file_format not in CONTENT_TYPES:
+        raise ValueError(f"Unknown format {file_format}, expected one of {', '.join(CONTENT_TYPES)}")
+    resources = tuple(values("resources")) if path == "/allocate" else ()
+    if path == "/allocate" and not resources:
+        raise ValueError("Missing parameter resources")
+    request = PlanRequest(query=param("jql"),
+                          mode=mode,
+                          start_date=parse_date(param("start_date")),
+                          calendar=(tuple(sorted(map(parse_date, values("exclude")))),
+                                    tuple(sorted(map(int, values("holiday_weekday", "5,6"))))),
+                          resources=resources)
+    return request, file_format, param("html_mode", "cdn")
+
+
+class _Handler(BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        service: PlanningService = self.server.service
+        if url.path == "/stats":
+            self._send(200, CONTENT_TYPES["json"], json.dumps(service.summary()))
+            return
+        if url.path not in ("/gantt", "/allocate"):
+            self.send_error(404)
+            return
+        try:
+            request, file_format, html_mode = parse_request(
+                url.path, parse_qs(url.query))
+        except ValueError as e:
+            self.send_error(400, explain=str(e))
+            return
+        try:
+            timeline_tasks = service.timeline(request)
+            columns, chart = allocation_chart(
+                timeline_tasks) if request.resources else gantt_chart(timeline_tasks)
+            body = render_text(columns, chart, file_format, html_mode)
+        except Exception as e:
+            self.log_error("%s failed: %r", self.path, e)
+            self.send_error(500, explain=str(e))
+            return
+        self._send(200, CONTENT_TYPES[file_format], body)
+
+    def _send(self, status: int, content_type: str, body: str):
+        data = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+def make_server(service: PlanningService, host: str = "127.0.0.1", port: int = 0) -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer((host, port), _Handler)
+    server.service = service
+    return server
+
+
+def serve(service: PlanningService, host: str, port: int, refresh_seconds: float):
+    server = make_server(service, host, port)
+    stopped = threading.Event()
+    threading.Thread(target=_refresh_loop, args=(
+        service, refresh_seconds, stopped), daemon=True).start()
+    print(f"Serving on http://{host}:{server.server_address[1]}", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stopped.set()
+        server.server_close()
+
+
+def _refresh_loop(service: PlanningService, refresh_seconds: float, stopped: threading.Event):
+    while not stopped.wait(refresh_seconds):
+        try:
+            changed = service.refresh()
+        except Exception as e:
+            print(f"Refresh failed: {e!r}", file=sys.stderr)
+            continue
+        if changed:
+            print(f"Issues changed for {', '.join(changed)}", file=sys.stderr)
+
+
+__all__ = ["PlanRequest", "PlanningService", "ServiceStats", "CONTENT_TYPES", "parse_request", "make_server", "serve"]
@@ -0,0 +1,242 @@
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, List, Optional, Sequence, TextIO, Tuple
+import csv
+import io
+import json
+
+FORMATS = ["html", "png", "svg", "csv", "json", "ics"]
+HTML_MODES = ["inline", "cdn", "webgl"]
+# Number of issue keys listed in the summary of a collapsed bar.
+COLLAPSED_SUMMARY_CODES = 5
+WEBGL_BAR_WIDTH = 10
+
+# Charts are built from columns, lists of the same length keyed by column
+# name. JiraID, Summary, Start, End and Link are always there, Start and End
+# holding dates.
+Columns = Dict[str, list]
+
+
+@dataclass
+class Chart:
+    # Column of the rows of the chart and columns shown when hovering a bar.
+    y: str
+    hover: List[str]
+    color: Optional[str] = None
+    color_map: Dict[str, str] = field(default_factory=dict)
+    # Column telling which bars are outlined.
+    outline: Optional[str] = None
+    reverse_y: bool = False
+
+
+def timeline_columns(timeline_tasks: Sequence, with_resource: bool = False) -> Columns:
+    codes, summaries, starts, ends, links, resources = [], [], [], [], [], []
+    for task in timeline_tasks:
+        codes.append(task.code)
+        summaries.append(task.description)
+        starts.append(task.start)
+        ends.append(task.end)
+        links.append(task.link)
+        if with_resource:
+            resources.append(task.resource)
+    columns = {"JiraID": codes, "Summary": summaries,
+               "Start": starts, "End": ends, "Link": links}
+    if with_resource:
+        columns["Resource"] = resources
+    return columns
+
+
+def collapse(columns: Columns, chart: Chart, groups: Sequence[str]) -> Tuple[Columns, Chart]:
+    # Tasks of every group merged into one bar for every period in which the
+    # group has tasks running, named after the group. Other columns are
+    # dropped, except the one of the rows when it is the group.
+    rows_by_group: Dict[str, List[int]] = {}
+    for row, group in enumerate(groups):
+        rows_by_group.setdefault(group, []).append(row)
+    starts, ends, codes = columns["Start"], columns["End"], columns["JiraID"]
+    collapsed: Columns = {"JiraID": [], "Summary": [],
+                          "Start": [], "End": [], "Link": []}
+    if chart.y not in collapsed:
+        collapsed[chart.y] = []
+
+    def add(group: str, period: List[int]):
+        listed = ", ".join(codes[row]
+                           for row in period[:COLLAPSED_SUMMARY_CODES])
+        more = ", ..." if len(period) > COLLAPSED_SUMMARY_CODES else ""
+        collapsed["JiraID"].append(group)
+        collapsed["Summary"].append(
+            f"{len(period)} {'task' if len(period) == 1 else 'tasks'}: {listed}{more}")
+        collapsed["Start"].append(min(starts[row] for row in period))
+        collapsed["End"].append(max(ends[row] for row in period))
+        collapsed["Link"].append(None)
+        if chart.y != "JiraID":
+            collapsed[chart.y].append(group)
+
+    for group, rows in rows_by_group.items():
+        rows.sort(key=lambda row: starts[row])
+        period, period_end = [], None
+        for row in rows:
+            if period and starts[row] > period_end:
+                add(group, period)
+                period = []
+            period_end = max(period_end, ends[row]) if period else ends[row]
+            period.append(row)
+        add(group, period)
+    return collapsed, Chart(y=chart.y,
+                            hover=["Summary"],
+                            color=chart.color if chart.color == chart.y else None,
+                            color_map=chart.color_map,
+                            reverse_y=chart.reverse_y)
+
+
+def render(columns: Columns, chart: Chart, output: str, file_format: str = "html", html_mode: str = "inline"):
+    # Writes output with the extension of the format.
+    path = f"{output}.{file_format}"
+    if file_format in ("png", "svg"):
+        # Static images are rendered by kaleido.
+        bar_figure(columns, chart).write_image(path)
+    else:
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            f.write(render_text(columns, chart, file_format, html_mode))
+
+
+def render_text(columns: Columns, chart: Chart, file_format: str = "html", html_mode: str = "inline") -> str:
+    # CSV, JSON and iCalendar output do not need pandas nor plotly.
+    text = io.StringIO()
+    if file_format == "csv":
+        write_csv(columns, text)
+    elif file_format == "json":
+        write_json(columns, text)
+    elif file_format == "ics":
+        write_ical(columns, text)
+    elif file_format == "html":
+        fig = webgl_figure(
+            columns, chart) if html_mode == "webgl" else bar_figure(columns, chart)
+        return fig.to_html(include_plotlyjs="cdn" if html_mode in ("cdn", "webgl") else True)
+    else:
+        raise ValueError(f"{file_format} is not a text format")
+    return text.getvalue()
+
+
+def bar_figure(columns: Columns, chart: Chart):
+    import pandas as pd
+    import plotly.express as px
+    df = pd.DataFrame(_formatted(columns))
+    fig = px.timeline(df, x_start="Start", x_end="End", y=chart.y, hover_data=chart.hover, color=chart.color,
+                      color_discrete_map=chart.color_map)
+    if chart.outline:
+        outline_index = chart.hover.index(chart.outline)
+        for trace in fig.data:
+            trace.marker.line.color = "black"
+            trace.marker.line.width = [3 if row[outline_index] else 0
+                                       for row in trace.customdata]
+    if chart.reverse_y:
+        fig.update_yaxes(autorange="reversed")
+    return fig
+
+
+def webgl_figure(columns: Columns, chart: Chart):
+    # Every bar is a thick line segment, all the segments of a colour in one
+    # WebGL trace, which browsers draw much faster than one SVG bar per task.
+    import plotly.graph_objects as go
+    formatted = _formatted(columns)
+    labels = [f"{columns['JiraID'][row]}<br>" + "<br>".join(f"{name}: {formatted[name][row]}"
+                                                               for name in chart.hover)
+              for row in range(len(columns["JiraID"]))]
+    rows_by_color: Dict[str, List[int]] = {}
+    for row in range(len(columns["JiraID"])):
+        rows_by_color.setdefault(
+            str(columns[chart.color][row]) if chart.color else "", []).append(row)
+    fig = go.Figure()
+    for color, rows in rows_by_color.items():
+        fig.add_trace(_segments(formatted, chart.y, labels, rows, color,
+                                dict(width=WEBGL_BAR_WIDTH, color=chart.color_map.get(color))))
+    if chart.outline:
+        fig.add_trace(_segments(formatted, chart.y, labels,
+                                [row for row in range(len(columns["JiraID"]))
+                                 if columns[chart.outline][row]],
+                                chart.outline, dict(width=WEBGL_BAR_WIDTH // 3, color="black")))
+    fig.update_xaxes(type="date")
+    fig.update_yaxes(type="category", autorange="reversed" if chart.reverse_y else True)
+    fig.update_layout(showlegend=bool(chart.color or chart.outline))
+    return fig
+
+
+def _segments(formatted: Columns, y: str, labels: List[str], rows: List[int], name: str, line: dict):
+    import plotly.graph_objects as go
+    x_values, y_values, text = [], [], []
+    for row in rows:
+        x_values += [formatted["Start"][row], formatted["End"][row], None]
+        y_values += [formatted[y][row], formatted[y][row], None]
+        text += [labels[row], labels[row], None]
+    return go.Scattergl(x=x_values, y=y_values, text=text, name=name, mode="lines", line=line, hoverinfo="text")
+
+
+def _formatted(columns: Columns) -> Columns:
+    return {name: [value.isoformat() if isinstance(value, date) else value for value in values]
+            for name, values in columns.items()}
+
+
+def _rows(columns: Columns) -> List[dict]:
+    formatted = _formatted(columns)
+    return [dict(zip(formatted, values)) for values in zip(*formatted.values())]
+
+
+def write_csv(columns: Columns, f: TextIO):
+    formatted = _formatted(columns)
+    writer = csv.writer(f)
+    writer.writerow(formatted)
+    writer.writerows(zip(*formatted.values()))
+
+
+def write_json(columns: Columns, f: TextIO):
+    json.dump(_rows(columns), f, indent=1)
+
+
+def write_ical(columns: Columns, f: TextIO):
+    # One all-day event per row. Ends are exclusive like in iCalendar, tasks
+    # taking no time last their start day.
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    lines = ["BEGIN:VCALENDAR", "VERSION:2.0",
+             "PRODID:-//jira-gantt//EN", "CALSCALE:GREGORIAN"]
+    for row, code in enumerate(columns["JiraID"]):
+        start, end = columns["Start"][row], columns["End"][row]
+        lines += ["BEGIN:VEVENT",
+                  f"UID:{code}-{start.strftime('%Y%m%d')}@jira-gantt",
+                  f"DTSTAMP:{stamp}",
+                  f"DTSTART;VALUE=DATE:{start.strftime('%Y%m%d')}",
+                  f"DTEND;VALUE=DATE:{max(end, start + timedelta(days=1)).strftime('%Y%m%d')}",
+                  f"SUMMARY:{_ical_text(code)}" + (f" {_ical_text(columns['Summary'][row])}"
+                                                   if columns["Summary"][row] else "")]
+        if columns["Link"][row]:
+            lines.append(f"URL:{columns['Link'][row]}")
+        if "Resource" in columns:
+            lines.append(f"DESCRIPTION:{_ical_text(columns['Resource'][row])}")
+        lines.append("END:VEVENT")
+    lines.append("END:VCALENDAR")
+    for line in lines:
+        f.write(_ical_fold(line))
+
+
+def _ical_text(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,").replace("\n", "\\n")
+
+
+def _ical_fold(line: str) -> str:
+    # Lines longer than 75 octets continue on lines starting with a space.
+    encoded = line.encode("utf-8")
+    parts = []
+    limit = 75
+    while len(encoded) > limit:
+        cut = limit
+        while cut and (encoded[cut] & 0xC0) == 0x80:
+            cut -= 1
+        parts.append(encoded[:cut].decode("utf-8"))
+        encoded = encoded[cut:]
+        limit = 74
+    parts.append(encoded.decode("utf-8"))
+    return "\r\n ".join(parts) + "\r\n"
+
+
+__all__ = ["Chart", "Columns", "FORMATS", "HTML_MODES", "timeline_columns", "collapse", "render", "render_text",
+           "bar_figure", "webgl_figure", "write_csv", "write_json", "write_ical"]
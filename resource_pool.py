@@ -0,0 +1,103 @@
+from datetime import date
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+import heapq
+
+
+class _Slots:
+    # Slots available at the same date, taken by lowest or highest index in
+    # O(log k): a heap for each end, entries taken from one heap are only
+    # dropped from the other when they reach its top.
+
+    def __init__(self, slots: Iterable[int] = ()):
+        self._members = set(slots)
+        self._lowest = sorted(self._members)
+        self._highest = [-slot for slot in reversed(self._lowest)]
+
+    def __len__(self) -> int:
+        return len(self._members)
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self._members)
+
+    def add(self, slot: int):
+        self._members.add(slot)
+        heapq.heappush(self._lowest, slot)
+        heapq.heappush(self._highest, -slot)
+
+    def pop_lowest(self) -> int:
+        while True:
+            slot = heapq.heappop(self._lowest)
+            if slot in self._members:
+                self._members.remove(slot)
+                return slot
+
+    def pop_highest(self) -> int:
+        while True:
+            slot = -heapq.heappop(self._highest)
+            if slot in self._members:
+                self._members.remove(slot)
+                return slot
+
+
+class ResourcePool:
+    # Resources are expanded into slots, one per task a resource can run in
+    # parallel. Slot indexes follow the order in which resources are listed.
+    # Slots are grouped by availability date, with a heap of the distinct
+    # dates and the slots available at every date in _Slots, so that both
+    # acquire and release take O(log R).
+    #
+    # acquire picks the slot available the earliest. Ties between slots that
+    # are available by the prospected start date go to the slot listed first;
+    # ties between slots that only become available after it go to the slot
+    # listed last. This is the order the original linear scans used.
+
+    def __init__(self, resources: List[str], start_date: date, capacities: Optional[Dict[str, int]] = None):
+        capacities = capacities if capacities else {}
+        self._slots: List[str] = []
+        for resource in dict.fromkeys(resources):
+            capacity = capacities.get(resource, 1)
+            if capacity < 1:
+                raise ValueError(
+                    f"Capacity of resource {resource} must be at least 1")
+            self._slots.extend([resource] * capacity)
+        self._dates: List[date] = [start_date] if self._slots else []
+        self._slots_by_date: Dict[date, _Slots] = {
+            start_date: _Slots(range(len(self._slots)))} if self._slots else {}
+
+    def resource(self, slot: int) -> str:
+        return self._slots[slot]
+
+    def acquire(self, prospected_start_date: date) -> Tuple[int, date]:
+        available = self._dates[0]
+        slots = self._slots_by_date[available]
+        slot = slots.pop_lowest() if available <= prospected_start_date else slots.pop_highest()
+        if not slots:
+            heapq.heappop(self._dates)
+            del self._slots_by_date[available]
+        return slot, available
+
+    def release(self, slot: int, available: date):
+        slots = self._slots_by_date.get(available)
+        if slots is None:
+            self._slots_by_date[available] = _Slots([slot])
+            heapq.heappush(self._dates, available)
+        else:
+            slots.add(slot)
+
+    def availability(self) -> Dict[int, date]:
+        return {slot: available for available, slots in self._slots_by_date.items() for slot in slots}
+
+    def restore(self, availability: Dict[int, date]):
+        # Sets the availability of the given slots, as if the tasks ending
+        # at those dates had been allocated to them.
+        current = self.availability()
+        slots_by_date: Dict[date, List[int]] = {}
+        for slot in current:
+            slots_by_date.setdefault(
+                availability.get(slot, current[slot]), []).append(slot)
+        self._slots_by_date = {available: _Slots(slots) for available, slots in slots_by_date.items()}
+        self._dates = list(self._slots_by_date)
+        heapq.heapify(self._dates)
+
+
+__all__ = ["ResourcePool"]
@@ -0,0 +1,110 @@
+from contextlib import contextmanager, nullcontext
+from dataclasses import dataclass, field
+from datetime import date
+from resource_pool import ResourcePool
+from typing import ContextManager, Dict, Iterable, Iterator, List, Optional, Tuple
+from working_calendar import WorkingCalendar
+import json
+import sys
+import time
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+
+@dataclass
+class RunStats:
+    # Seconds spent in every phase of a run, phases may be nested, and
+    # counters of the work done.
+    phases: Dict[str, float] = field(default_factory=dict)
+    counters: Dict[str, int] = field(default_factory=dict)
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = self.phases.get(
+                name, 0) + time.perf_counter() - started
+
+    def count(self, name: str, value: int = 1):
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def to_dict(self) -> dict:
+        return {"phases": dict(self.phases),
+                "counters": dict(self.counters),
+                "peak_memory_bytes": peak_memory_bytes()}
+
+    def write(self, path: str):
+        with open(path, "w") as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+
+def phase(stats: Optional[RunStats], name: str) -> ContextManager:
+    # Times the phase only when collecting stats.
+    return stats.phase(name) if stats is not None else nullcontext()
+
+
+def peak_memory_bytes() -> Optional[int]:
+    # Peak resident set size of the process, not available on Windows.
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+class CountingCalendar(WorkingCalendar):
+    # Working calendar counting the lookups and the calendar days stepped
+    # through to find the working days. Only used when collecting stats, so
+    # that the plain calendar has no counting overhead.
+
+    def __init__(self, stats: RunStats, start_date: date,
+                 skipped_dates: Optional[Iterable[date]] = None,
+                 skipped_weekdays: Optional[Iterable[int]] = None):
+        self._stats = stats
+        super().__init__(start_date, skipped_dates, skipped_weekdays)
+
+    def with_skipped_dates(self, skipped_dates: Iterable[date]) -> "WorkingCalendar":
+        return CountingCalendar(self._stats, date.fromordinal(self._first),
+                                self._skipped_dates.union(skipped_dates),
+                                self._skipped_weekdays)
+
+    def next_working_day(self, day: date) -> date:
+        self._stats.count("calendar_lookups")
+        return super().next_working_day(day)
+
+    def add_working_days(self, day: date, working_days: int) -> date:
+        self._stats.count("calendar_lookups")
+        return super().add_working_days(day, working_days)
+
+    def working_day_ordinals(self, day: date, count: int) -> List[int]:
+        self._stats.count("calendar_lookups")
+        return super().working_day_ordinals(day, count)
+
+    def working_days_between(self, start: date, end: date) -> int:
+        self._stats.count("calendar_lookups")
+        return super().working_days_between(start, end)
+
+    def _working_ordinals(self, first: int, last: int) -> List[int]:
+        self._stats.count("calendar_days_stepped", last - first)
+        return super()._working_ordinals(first, last)
+
+
+class CountingResourcePool(ResourcePool):
+    # Resource pool counting the lookups of the resource available first.
+
+    def __init__(self, stats: RunStats, resources: List[str], start_date: date,
+                 capacities: Optional[Dict[str, int]] = None):
+        self._stats = stats
+        super().__init__(resources, start_date, capacities)
+
+    def acquire(self, prospected_start_date: date) -> Tuple[int, date]:
+        self._stats.count("resource_lookups")
+        return super().acquire(prospected_start_date)
+
+
+__all__ = ["RunStats", "phase", "peak_memory_bytes",
+           "CountingCalendar", "CountingResourcePool"]
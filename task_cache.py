@@ -0,0 +1,142 @@
+from dataclasses import asdict, dataclass
+from jira_task_extraction import (FetchStats, TASK_FIELDS, crawl_linked_issues, issue_to_task, linked_keys, make_session,
+                                  restrict_search, search_issues, search_issues_by_keys)
+from tasks import Task
+from typing import List, Optional, Tuple
+import json
+import math
+import os
+import sqlite3
+import time
+
+# Margin added to the time since the last sync when asking Jira for updated
+# issues, to absorb clock skew between this machine and the Jira server.
+SYNC_MARGIN_MINUTES = 5
+_SCHEMA_VERSION = 1
+
+
+@dataclass
+class CachedTask:
+    task: Task
+    linked: List[str]
+    crawled: bool = False
+
+
+class TaskCache:
+
+    def __init__(self, cache_dir: str):
+        os.makedirs(cache_dir, exist_ok=True)
+        self._connection = sqlite3.connect(
+            os.path.join(cache_dir, "tasks.sqlite3"))
+        (schema_version,) = self._connection.execute(
+            "PRAGMA user_version").fetchone()
+        with self._connection:
+            if schema_version != _SCHEMA_VERSION:
+                self._connection.execute("DROP TABLE IF EXISTS searches")
+                self._connection.execute("DROP TABLE IF EXISTS tasks")
+                self._connection.execute(
+                    f"PRAGMA user_version = {_SCHEMA_VERSION}")
+            self._connection.execute("""CREATE TABLE IF NOT EXISTS searches (
+                                            search_id INTEGER PRIMARY KEY,
+                                            jira_url TEXT NOT NULL,
+                                            search TEXT NOT NULL,
+                                            options TEXT NOT NULL,
+                                            synced_at REAL NOT NULL,
+                                            UNIQUE (jira_url, search, options))""")
+            self._connection.execute("""CREATE TABLE IF NOT EXISTS tasks (
+                                            search_id INTEGER NOT NULL,
+                                            position INTEGER NOT NULL,
+                                            code TEXT NOT NULL,
+                                            task TEXT NOT NULL,
+                                            linked TEXT NOT NULL,
+                                            crawled INTEGER NOT NULL,
+                                            PRIMARY KEY (search_id, code))""")
+
+    def load(self, jira_url: str, search: str, options: dict) -> Optional[Tuple[float, List[CachedTask]]]:
+        row = self._connection.execute("SELECT search_id, synced_at FROM searches WHERE jira_url = ? AND search = ? AND options = ?",
+                                       (jira_url, search, _options_key(options))).fetchone()
+        if not row:
+            return None
+        search_id, synced_at = row
+        return synced_at, [CachedTask(Task(**json.loads(task)), json.loads(linked), bool(crawled))
+                           for task, linked, crawled in self._connection.execute(
+                               "SELECT task, linked, crawled FROM tasks WHERE search_id = ? ORDER BY position", (search_id,))]
+
+    def store(self, jira_url: str, search: str, options: dict, synced_at: float, cached_tasks: List[CachedTask]):
+        with self._connection:
+            self._connection.execute("""INSERT INTO searches (jira_url, search, options, synced_at) VALUES (?, ?, ?, ?)
+                                        ON CONFLICT (jira_url, search, options) DO UPDATE SET synced_at = excluded.synced_at""",
+                                     (jira_url, search, _options_key(options), synced_at))
+            (search_id,) = self._connection.execute("SELECT search_id FROM searches WHERE jira_url = ? AND search = ? AND options = ?",
+                                                    (jira_url, search, _options_key(options))).fetchone()
+            self._connection.execute(
+                "DELETE FROM tasks WHERE search_id = ?", (search_id,))
+            self._connection.executemany("INSERT INTO tasks (search_id, position, code, task, linked, crawled) VALUES (?, ?, ?, ?, ?, ?)",
+                                         ((search_id, position, cached_task.task.code, json.dumps(asdict(cached_task.task)),
+                                           json.dumps(cached_task.linked), int(cached_task.crawled))
+                                          for position, cached_task in enumerate(cached_tasks)))
+
+    def close(self):
+        self._connection.close()
+
+
+def sync_tasks_from_search(cache: TaskCache, user: str, password: str, jira_url: str, search: str, dependency_types: List[str],
+                           page_size: int = 100, concurrency: int = 4, refresh: bool = False, offline: bool = False,
+                           stats: Optional[FetchStats] = None,
+                           crawl_depth: int = 0, crawl_budget: Optional[int] = None) -> List[Task]:
+    # Issues crawled outside the search are not synced incrementally: they
+    # are crawled again on every online run, starting from the links of the
+    # issues in the search.
+    options = {"dependency_types": sorted(dependency_types),
+               "crawl_depth": crawl_depth,
+               "crawl_budget": crawl_budget}
+    cached = cache.load(jira_url, search, options)
+    if offline:
+        if not cached:
+            raise ValueError(
+                f"No cached issues for {search} on {jira_url}, run once without --offline")
+        return [cached_task.task for cached_task in cached[1]]
+    synced_at = time.time()
+    session = make_session(user, password, concurrency)
+    if refresh or not cached:
+        cached_tasks = [_cached_task(issue, jira_url, dependency_types)
+                        for issue in search_issues(session, jira_url, search, TASK_FIELDS, page_size, concurrency, stats)]
+    else:
+        cached_tasks = _incremental_sync(session, jira_url, search, dependency_types, page_size, concurrency,
+                                         cached[0], [cached_task for cached_task in cached[1] if not cached_task.crawled], stats)
+    if crawl_depth:
+        crawled_issues = crawl_linked_issues(session, jira_url, {cached_task.task.code for cached_task in cached_tasks},
+                                             [key for cached_task in cached_tasks for key in cached_task.linked],
+                                             dependency_types, page_size, concurrency, crawl_depth, crawl_budget, stats)
+        cached_tasks.extend(_cached_task(issue, jira_url, dependency_types, crawled=True)
+                            for issue in crawled_issues)
+    cache.store(jira_url, search, options, synced_at, cached_tasks)
+    return [cached_task.task for cached_task in cached_tasks]
+
+
+def _incremental_sync(session, jira_url: str, search: str, dependency_types: List[str], page_size: int, concurrency: int,
+                      last_synced_at: float, cached_tasks: List[CachedTask], stats: Optional[FetchStats]) -> List[CachedTask]:
+    # Issues updated since the last sync are fetched in full, then a keys-only
+    # pass over the whole search finds issues that were deleted or moved out
+    # of it, and issues that entered it without being updated.
+    minutes = math.ceil((time.time() - last_synced_at) / 60) + \
+        SYNC_MARGIN_MINUTES
+    updated_issues = search_issues(session, jira_url, restrict_search(search, f"updated >= -{minutes}m"),
+                                   TASK_FIELDS, page_size, concurrency, stats)
+    current_codes = [issue["key"] for issue in search_issues(session, jira_url, search, ["key"],
+                                                             page_size, concurrency, stats)]
+    tasks = {cached_task.task.code: cached_task for cached_task in cached_tasks}
+    for issue in updated_issues:
+        tasks[issue["key"]] = _cached_task(issue, jira_url, dependency_types)
+    missing_codes = [code for code in current_codes if code not in tasks]
+    for issue in search_issues_by_keys(session, jira_url, missing_codes, TASK_FIELDS, page_size, concurrency, stats):
+        tasks[issue["key"]] = _cached_task(issue, jira_url, dependency_types)
+    return [tasks[code] for code in current_codes if code in tasks]
+
+
+def _cached_task(issue: dict, jira_url: str, dependency_types: List[str], crawled: bool = False) -> CachedTask:
+    return CachedTask(issue_to_task(issue, jira_url, dependency_types), linked_keys(issue, dependency_types), crawled)
+
+
+def _options_key(options: dict) -> str:
+    return json.dumps(options, sort_keys=True)
@@ -0,0 +1,135 @@
+from dataclasses import asdict
+from tasks import Task, TaskRepository
+from typing import Iterable, Iterator
+import csv
+import json
+import os
+
+CSV_COLUMNS = ["code", "blocks", "description", "link",
+               "original_estimate_hours", "remaining_estimate_hours"]
+PARQUET_BATCH_SIZE = 10000
+
+
+def load_tasks(path: str, task_repository: TaskRepository) -> TaskRepository:
+    for task in iter_tasks(path):
+        task_repository.save(task)
+    return task_repository
+
+
+def iter_tasks(path: str) -> Iterator[Task]:
+    file_format = _file_format(path)
+    if file_format == "jsonl":
+        return _iter_jsonl(path)
+    elif file_format == "csv":
+        return _iter_csv(path)
+    else:
+        return _iter_parquet(path)
+
+
+def export_tasks(tasks: Iterable[Task], path: str):
+    file_format = _file_format(path)
+    if file_format == "jsonl":
+        _export_jsonl(tasks, path)
+    elif file_format == "csv":
+        _export_csv(tasks, path)
+    else:
+        _export_parquet(tasks, path)
+
+
+def _file_format(path: str) -> str:
+    extension = os.path.splitext(path)[1].lower()
+    if extension in (".jsonl", ".ndjson"):
+        return "jsonl"
+    elif extension == ".csv":
+        return "csv"
+    elif extension == ".parquet":
+        _pyarrow()
+        return "parquet"
+    raise ValueError(
+        f"Unsupported task file {path}, expected a .jsonl, .ndjson, .csv or .parquet file")
+
+
+def _task(record: dict) -> Task:
+    if not record.get("code"):
+        raise ValueError(f"Task record without code: {record}")
+    return Task(code=record["code"],
+                blocks=list(record.get("blocks") or []),
+                description=record.get("description") or None,
+                link=record.get("link") or None,
+                original_estimate_hours=float(
+                    record.get("original_estimate_hours") or 0),
+                remaining_estimate_hours=float(record.get("remaining_estimate_hours") or 0))
+
+
+def _iter_jsonl(path: str) -> Iterator[Task]:
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield _task(json.loads(line))
+
+
+def _export_jsonl(tasks: Iterable[Task], path: str):
+    with open(path, "w", encoding="utf-8") as f:
+        for task in tasks:
+            f.write(json.dumps(asdict(task)))
+            f.write("\n")
+
+
+def _iter_csv(path: str) -> Iterator[Task]:
+    # Blocked issue keys are space separated in the blocks column.
+    with open(path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            row["blocks"] = (row.get("blocks") or "").split()
+            yield _task(row)
+
+
+def _export_csv(tasks: Iterable[Task], path: str):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=CSV_COLUMNS)
+        writer.writeheader()
+        for task in tasks:
+            row = asdict(task)
+            row["blocks"] = " ".join(task.blocks)
+            writer.writerow(row)
+
+
+def _pyarrow():
+    # Imported only for Parquet files, it is slow to import.
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise ValueError("Parquet files require pyarrow to be installed")
+    return pyarrow
+
+
+def _iter_parquet(path: str) -> Iterator[Task]:
+    pyarrow = _pyarrow()
+    parquet_file = pyarrow.parquet.ParquetFile(path)
+    for batch in parquet_file.iter_batches(batch_size=PARQUET_BATCH_SIZE):
+        for record in batch.to_pylist():
+            yield _task(record)
+
+
+def _export_parquet(tasks: Iterable[Task], path: str):
+    pyarrow = _pyarrow()
+    schema = pyarrow.schema([("code", pyarrow.string()),
+                             ("blocks", pyarrow.list_(pyarrow.string())),
+                             ("description", pyarrow.string()),
+                             ("link", pyarrow.string()),
+                             ("original_estimate_hours", pyarrow.float64()),
+                             ("remaining_estimate_hours", pyarrow.float64())])
+    with pyarrow.parquet.ParquetWriter(path, schema) as writer:
+        batch = []
+        for task in tasks:
+            batch.append(asdict(task))
+            if len(batch) == PARQUET_BATCH_SIZE:
+                writer.write_batch(
+                    pyarrow.RecordBatch.from_pylist(batch, schema=schema))
+                batch = []
+        if batch:
+            writer.write_batch(
+                pyarrow.RecordBatch.from_pylist(batch, schema=schema))
+
+
+__all__ = ["load_tasks", "iter_tasks", "export_tasks"]
@@ -1,10 +1,28 @@
-from dataclasses import dataclass
-from typing import List, Dict, Optional, Set, Callable, Tuple
-from datetime import date, timedelta
+from dataclasses import dataclass, fields
+from typing import List, Dict, Optional, Set, Callable, Tuple, Iterable
+from datetime import date
+from collections import deque
+from array import array
+from itertools import chain
 import math
 import functools
+from working_calendar import WorkingCalendar
+from resource_pool import ResourcePool
+from run_stats import CountingCalendar, CountingResourcePool, RunStats, phase
 
 
+def _slots(cls):
+    # Tasks and timeline entries are created per issue, so they use
+    # __slots__: the dataclass is created again with a slot per field, as
+    # dataclass(slots=True) does from Python 3.10. Defaults stay in __init__.
+    names = tuple(field.name for field in fields(cls))
+    namespace = {key: value for key, value in cls.__dict__.items()
+                 if key not in names and key not in ("__dict__", "__weakref__")}
+    namespace["__slots__"] = names
+    return type(cls)(cls.__name__, cls.__bases__, namespace)
+
+
+@_slots
 @dataclass
 class Task:
     code: str
@@ -15,6 +33,7 @@ class Task:
     remaining_estimate_hours: float = 0
 
 
+@_slots
 @dataclass
 class TimelineTask:
     code: str
@@ -24,6 +43,7 @@ class TimelineTask:
     end: date
 
 
+@_slots
 @dataclass
 class TimelineTaskWithResource:
     code: str
@@ -34,6 +54,133 @@ class TimelineTaskWithResource:
     end: date
 
 
+class CyclicDependencyError(Exception):
+
+    def __init__(self, cycle: List[str]):
+        super().__init__(
+            f"Dependency cycle between issues: {' -> '.join(cycle + cycle[:1])}")
+        self.cycle = cycle
+
+
+class DependencyGraph:
+    # Blocking links between tasks in compressed sparse row form over dense
+    # task indexes, in both directions: the tasks that task i blocks are
+    # blocks_targets[blocks_offsets[i]:blocks_offsets[i + 1]], and the tasks
+    # blocking it are blocked_by_targets[blocked_by_offsets[i]:blocked_by_offsets[i + 1]].
+
+    def __init__(self, codes: List[str], blocks_offsets: array, blocks_targets: array):
+        self.codes = codes
+        self.blocks_offsets = blocks_offsets
+        self.blocks_targets = blocks_targets
+        self.blocked_by_offsets, self.blocked_by_targets = _transpose(
+            len(codes), blocks_offsets, blocks_targets)
+        self._index = {code: index for index, code in enumerate(codes)}
+
+    @classmethod
+    def from_blocks(cls, codes: List[str], blocks: Iterable[Iterable[int]]) -> "DependencyGraph":
+        offsets = array("i", [0])
+        targets = array("i")
+        for blocked in blocks:
+            targets.extend(blocked)
+            offsets.append(len(targets))
+        return cls(codes, offsets, targets)
+
+    def index(self, code: str) -> int:
+        return self._index[code]
+
+    def blockers(self, code: str) -> List[str]:
+        index = self._index[code]
+        return [self.codes[blocker] for blocker in
+                self.blocked_by_targets[self.blocked_by_offsets[index]:self.blocked_by_offsets[index + 1]]]
+
+    def topological_order(self) -> List[str]:
+        return [self.codes[index] for index in self.topological_indexes()]
+
+    def topological_indexes(self) -> List[int]:
+        # Kahn's algorithm with a FIFO ready queue: tasks come out in the same
+        # rounds as a full rescan for unblocked tasks would produce, with ties
+        # in repository insertion order.
+        remaining_blockers = array("i", (self.blocked_by_offsets[index + 1] - self.blocked_by_offsets[index]
+                                         for index in range(len(self.codes))))
+        ready = deque(index for index in range(len(self.codes))
+                      if not remaining_blockers[index])
+        order = []
+        while ready:
+            index = ready.popleft()
+            order.append(index)
+            for blocked in self.blocks_targets[self.blocks_offsets[index]:self.blocks_offsets[index + 1]]:
+                remaining_blockers[blocked] -= 1
+                if not remaining_blockers[blocked]:
+                    ready.append(blocked)
+        if len(order) < len(self.codes):
+            raise CyclicDependencyError(self._find_cycle(remaining_blockers))
+        return order
+
+    def rounds(self, order: List[int]) -> int:
+        # Rounds of the ready set loop of Kahn's algorithm, that is the
+        # number of tasks on the longest chain of blocking links, given the
+        # tasks in topological order.
+        level = array("i", [0]) * len(self.codes)
+        for index in order:
+            next_level = level[index] + 1
+            for blocked in self.blocks_targets[self.blocks_offsets[index]:self.blocks_offsets[index + 1]]:
+                if level[blocked] < next_level:
+                    level[blocked] = next_level
+        return max(level) + 1 if len(level) else 0
+
+    def weakly_connected_components(self) -> List[List[int]]:
+        # Groups of tasks linked by blocking links in either direction, each
+        # in insertion order, ordered by their first task.
+        component = array("i", [-1]) * len(self.codes)
+        components = []
+        for first in range(len(self.codes)):
+            if component[first] >= 0:
+                continue
+            component[first] = len(components)
+            members = [first]
+            stack = [first]
+            while stack:
+                index = stack.pop()
+                for linked in chain(self.blocks_targets[self.blocks_offsets[index]:self.blocks_offsets[index + 1]],
+                                    self.blocked_by_targets[self.blocked_by_offsets[index]:self.blocked_by_offsets[index + 1]]):
+                    if component[linked] < 0:
+                        component[linked] = len(components)
+                        members.append(linked)
+                        stack.append(linked)
+            components.append(sorted(members))
+        return components
+
+    def _find_cycle(self, remaining_blockers: array) -> List[str]:
+        # Every task left with blockers has at least one blocker that is also
+        # left, so walking backwards along those edges must revisit a task.
+        index = next(i for i in range(len(self.codes)) if remaining_blockers[i])
+        path = []
+        position = {}
+        while index not in position:
+            position[index] = len(path)
+            path.append(index)
+            index = next(b for b in self.blocked_by_targets[self.blocked_by_offsets[index]:self.blocked_by_offsets[index + 1]]
+                         if remaining_blockers[b])
+        cycle = path[position[index]:]
+        cycle.reverse()
+        return [self.codes[index] for index in cycle]
+
+
+def _transpose(size: int, offsets: array, targets: array) -> Tuple[array, array]:
+    transposed_offsets = array("i", [0]) * (size + 1)
+    for target in targets:
+        transposed_offsets[target + 1] += 1
+    for index in range(size):
+        transposed_offsets[index + 1] += transposed_offsets[index]
+    transposed_targets = array("i", [0]) * len(targets)
+    next_position = transposed_offsets[:-1]
+    for source in range(size):
+        for target in targets[offsets[source]:offsets[source + 1]]:
+            transposed_targets[next_position[target]] = source
+            next_position[target] += 1
+    return transposed_offsets, transposed_targets
+
+
 class TaskRepository:
 
     def __init__(self):
@@ -42,6 +189,9 @@ class TaskRepository:
     def save(self, task: Task):
         self._tasks[task.code] = task
 
+    def remove(self, code: str):
+        self._tasks.pop(code, None)
+
     def get(self, code: str) -> Optional[Task]:
         if code in self._tasks:
             return self._tasks[code]
@@ -61,17 +211,50 @@ class TaskRepository:
                     result[code_blocked].add(task.code)
         return result
 
+    def original_estimates(self) -> array:
+        return array("d", (task.original_estimate_hours for task in self._tasks.values()))
+
+    def remaining_estimates(self) -> array:
+        return array("d", (task.remaining_estimate_hours for task in self._tasks.values()))
+
+    def dependency_graph(self) -> DependencyGraph:
+        codes = list(self._tasks.keys())
+        index = {code: i for i, code in enumerate(codes)}
+        return DependencyGraph.from_blocks(codes, ([index[code_blocked] for code_blocked in dict.fromkeys(task.blocks) if code_blocked in index]
+                                                   for task in self._tasks.values()))
+
+
+@dataclass
+class AllocationProblem:
+    # What an allocation strategy needs to pick the order in which tasks are
+    # allocated. Tasks are identified by their index in dependency_graph.
+    dependency_graph: DependencyGraph
+    task_days: List[int]
+    # Cost of allocating the tasks in the given order, blockers first: the
+    # working days from the start date to the end of the last task, then the
+    # sum of the end dates of all tasks as day ordinals.
+    cost: Callable[[List[int]], Tuple[int, int]]
+
 
 class TimelineCalculator:
 
     def __init__(self, start_date: date,
                  hours_in_day: float,
                  skipped_dates: List[date] = None,
-                 skipped_weekdays: List[int] = None):
+                 skipped_weekdays: List[int] = None,
+                 resource_skipped_dates: Dict[str, List[date]] = None,
+                 stats: Optional[RunStats] = None):
         self._start_date = start_date
         self._hours_in_day = hours_in_day
         self._skipped_dates = skipped_dates if skipped_dates else []
         self._skipped_weekdays = skipped_weekdays if skipped_weekdays else []
+        # Calendars and resource pools only count their lookups when
+        # collecting stats.
+        self._stats = stats
+        self._calendar = CountingCalendar(stats, start_date, self._skipped_dates, self._skipped_weekdays) if stats \
+            else WorkingCalendar(start_date, self._skipped_dates, self._skipped_weekdays)
+        self._resource_calendars = {resource: self._calendar.with_skipped_dates(dates)
+                                    for resource, dates in (resource_skipped_dates or {}).items()}
 
     def compute_original_timeline(self, task_repository: TaskRepository) -> List[TimelineTask]:
         helper = self._CalculatorHelper(self, task_repository, [])
@@ -81,33 +264,92 @@ class TimelineCalculator:
         helper = self._CalculatorHelper(self, task_repository, [])
         return helper.compute_remaining_timeline()
 
-    def compute_original_resource_allocation(self, task_repository: TaskRepository, resources: List[str]) -> List[TimelineTaskWithResource]:
-        helper = self._CalculatorHelper(self, task_repository, resources)
-        return helper.compute_original_resource_allocation()
-
-    def compute_remaining_resource_allocation(self, task_repository: TaskRepository, resources: List[str]) -> List[TimelineTaskWithResource]:
-        helper = self._CalculatorHelper(self, task_repository, resources)
-        return helper.compute_remaining_resource_allocation()
+    def compute_original_resource_allocation(self, task_repository: TaskRepository, resources: List[str],
+                                           capacities: Dict[str, int] = None,
+                                           strategy: "AllocationStrategy" = None) -> List[TimelineTaskWithResource]:
+        helper = self._CalculatorHelper(
+            self, task_repository, resources, capacities)
+        return helper.compute_original_resource_allocation(strategy)
+
+    def compute_remaining_resource_allocation(self, task_repository: TaskRepository, resources: List[str],
+                                           capacities: Dict[str, int] = None,
+                                           strategy: "AllocationStrategy" = None) -> List[TimelineTaskWithResource]:
+        helper = self._CalculatorHelper(
+            self, task_repository, resources, capacities)
+        return helper.compute_remaining_resource_allocation(strategy)
+
+    def compute_original_critical_path(self, task_repository: TaskRepository) -> List["CriticalPathTask"]:
+        from critical_path import compute_critical_path
+        return compute_critical_path(task_repository, task_repository.original_estimates(), self._hours_in_day,
+                                     self._calendar, self._start_date)
+
+    def compute_remaining_critical_path(self, task_repository: TaskRepository) -> List["CriticalPathTask"]:
+        from critical_path import compute_critical_path
+        return compute_critical_path(task_repository, task_repository.remaining_estimates(), self._hours_in_day,
+                                     self._calendar, self._start_date)
+
+    def forecast_original_timeline(self, task_repository: TaskRepository, samples: int, **options) -> "Forecast":
+        from forecast import forecast
+        return forecast(task_repository, task_repository.original_estimates(), self._hours_in_day,
+                        self._calendar, self._start_date, samples, **options)
+
+    def forecast_remaining_timeline(self, task_repository: TaskRepository, samples: int, **options) -> "Forecast":
+        from forecast import forecast
+        return forecast(task_repository, task_repository.remaining_estimates(), self._hours_in_day,
+                        self._calendar, self._start_date, samples, **options)
+
+    def incremental_original_timeline(self, task_repository: TaskRepository) -> "IncrementalTimeline":
+        return IncrementalTimeline(self, task_repository, lambda task: task.original_estimate_hours)
+
+    def incremental_remaining_timeline(self, task_repository: TaskRepository) -> "IncrementalTimeline":
+        return IncrementalTimeline(self, task_repository, lambda task: task.remaining_estimate_hours)
+
+    def incremental_original_resource_allocation(self, task_repository: TaskRepository, resources: List[str],
+                                                 capacities: Dict[str, int] = None) -> "IncrementalResourceAllocation":
+        return IncrementalResourceAllocation(self, task_repository, resources, capacities,
+                                             lambda task: task.original_estimate_hours)
+
+    def incremental_remaining_resource_allocation(self, task_repository: TaskRepository, resources: List[str],
+                                                  capacities: Dict[str, int] = None) -> "IncrementalResourceAllocation":
+        return IncrementalResourceAllocation(self, task_repository, resources, capacities,
+                                             lambda task: task.remaining_estimate_hours)
 
     class _CalculatorHelper:
 
+        COST_CHECKPOINT_INTERVAL = 64
+
+        @dataclass
+        class CostState:
+            order: List[int]
+            ends: List[Optional[date]]
+            # (position, availability of the slots, end of the last task, sum
+            # of the end ordinals) before allocating the task at every
+            # multiple of the interval.
+            checkpoints: List[Tuple[int, Dict[int, date], date, int]]
+
         @dataclass
         class ResourceAllocationState:
-            resource_availability: Dict[str, date]
+            resource_pool: ResourcePool
             allocated_task: Dict[str, TimelineTaskWithResource]
+            allocated_slot: Dict[str, int]
 
-        def __init__(self, timeline_calculator, task_repository: TaskRepository, resources: List[str]):
+        def __init__(self, timeline_calculator, task_repository: TaskRepository, resources: List[str],
+                     capacities: Dict[str, int] = None, dependency_graph=None):
             self._task_repository = task_repository
             self._timeline_calculator = timeline_calculator
-            self._allocated_tasks: Set[str] = set()
             self._resources = resources
-            self._remaining_tasks = self._task_repository.codes()
-            self._is_blocked_by = self._task_repository.is_blocked_by_map()
+            self._capacities = capacities
+            self._stats = timeline_calculator._stats
+            if dependency_graph is None:
+                with phase(self._stats, "dependency_graph"):
+                    dependency_graph = self._task_repository.dependency_graph()
+            self._dependency_graph = dependency_graph
             self._result_timeline: Dict[str, TimelineTask] = {}
+            self._cost_state = None
             self._resources_state = self.ResourceAllocationState(
-                resource_availability={
-                    r: self._timeline_calculator._start_date for r in self._resources},
-                allocated_task={}
+                resource_pool=self._resource_pool(),
+                allocated_task={},
+                allocated_slot={}
             )
 
         def compute_original_timeline(self) -> List[TimelineTask]:
@@ -116,37 +358,44 @@ class TimelineCalculator:
         def compute_remaining_timeline(self) -> List[TimelineTask]:
             return self._compute_timeline(lambda task: task.remaining_estimate_hours)
 
+        def _resource_pool(self) -> ResourcePool:
+            if self._stats is not None:
+                return CountingResourcePool(self._stats, self._resources, self._timeline_calculator._start_date,
+                                            self._capacities)
+            return ResourcePool(self._resources, self._timeline_calculator._start_date, self._capacities)
+
+        def _scheduling_order(self) -> List[Task]:
+            order = self._dependency_graph.topological_indexes()
+            if self._stats is not None:
+                self._stats.count("ready_set_rounds",
+                                  self._dependency_graph.rounds(order))
+            return [self._task_repository.get(self._dependency_graph.codes[index]) for index in order]
+
         def _compute_timeline(self, remaining_extractor: Callable[[Task], float]) -> List[TimelineTask]:
-            while self._remaining_tasks:
-                root_tasks = self._get_tasks_without_blockers()
-                for task in root_tasks:
-                    task_start_date = self._get_start_date(task)
-                    task_days = self._task_days(remaining_extractor(task))
-                    task_end = self._end_date_allocation_with_exclusion(
-                        task_start_date, task_days)
-                    self._result_timeline[task.code] = TimelineTask(code=task.code,
-                                                                    description=task.description,
-                                                                    link=task.link,
-                                                                    start=task_start_date,
-                                                                    end=task_end)
-                    self._allocated_tasks.add(task.code)
-                    self._remaining_tasks.remove(task.code)
+            for task in self._scheduling_order():
+                self._result_timeline[task.code] = self._schedule_task(
+                    task, remaining_extractor)
+            if self._stats is not None:
+                self._stats.count("scheduled_tasks", len(self._result_timeline))
             return list(self._result_timeline.values())
 
+        def _schedule_task(self, task: Task, remaining_extractor: Callable[[Task], float]) -> TimelineTask:
+            task_start_date = self._get_start_date(task)
+            task_days = self._task_days(remaining_extractor(task))
+            task_end = self._end_date_allocation_with_exclusion(
+                task_start_date, task_days)
+            return TimelineTask(code=task.code,
+                                description=task.description,
+                                link=task.link,
+                                start=task_start_date,
+                                end=task_end)
+
         def _task_days(self, hours: float) -> int:
             return int(math.ceil(hours / self._timeline_calculator._hours_in_day))
 
-        def _get_tasks_without_blockers(self) -> List[Task]:
-            result = []
-            for remaining in self._remaining_tasks:
-                task = self._task_repository.get(remaining)
-                if not self._is_blocked_by[task.code].difference(self._allocated_tasks):
-                    result.append(task)
-            return result
-
         def _get_start_date(self, task: Task):
             is_caused_by_timelines = filter(lambda o: o, map(lambda code: self._result_timeline[code] if code in self._result_timeline else None,
-                                                             self._is_blocked_by[task.code]))
+                                                             self._dependency_graph.blockers(task.code)))
             max_end_date = functools.reduce(lambda x, y: y if x < y else x,
                                             map(lambda timeline: timeline.end,
                                                 is_caused_by_timelines),
@@ -154,88 +403,336 @@ class TimelineCalculator:
             return self._get_next_available_date(max_end_date)
 
         def _get_next_available_date(self, day: date) -> date:
-            search_day = day
-            while self._excluded(search_day):
-                search_day = search_day + timedelta(days=1)
-            return search_day
-
-        def _excluded(self, day: date) -> bool:
-            return day.weekday() in self._timeline_calculator._skipped_weekdays or day in self._timeline_calculator._skipped_dates
-
-        def _end_date_allocation_with_exclusion(self, day: date, allocation: int) -> date:
-            allocated = 0
-            end_date = day
-            while allocated < allocation:
-                if not self._excluded(end_date):
-                    allocated += 1
-                end_date = end_date + timedelta(days=1)
-            return end_date
-
-        def compute_original_resource_allocation(self) -> List[TimelineTaskWithResource]:
-            return self._compute_allocation(lambda task: task.original_estimate_hours)
-
-        def compute_remaining_resource_allocation(self) -> List[TimelineTaskWithResource]:
-            return self._compute_allocation(lambda task: task.remaining_estimate_hours)
-
-        def _compute_allocation(self, remaining_extractor: Callable[[Task], float]) -> List[TimelineTaskWithResource]:
-            while self._remaining_tasks:
-                root_tasks = self._get_tasks_without_blockers()
-                for task in root_tasks:
-                    prospected_task_start_date = self._get_start_date_for_resource(
-                        task)
-                    available_resource = self._find_available_resource(
-                        prospected_task_start_date)
-                    resource_availability_date = self._resources_state.resource_availability[
-                        available_resource]
-                    task_start_date = resource_availability_date if resource_availability_date >= prospected_task_start_date else prospected_task_start_date
-                    task_days = self._task_days(remaining_extractor(task))
-                    task_end = self._end_date_allocation_with_exclusion(
-                        task_start_date, task_days)
-                    self._resources_state.resource_availability[available_resource] = task_end
-                    self._resources_state.allocated_task[task.code] = TimelineTaskWithResource(code=task.code,
-                                                                                               resource=available_resource,
-                                                                                               description=task.description,
-                                                                                               link=task.link,
-                                                                                               start=task_start_date,
-                                                                                               end=task_end)
-                    self._allocated_tasks.add(task.code)
-                    self._remaining_tasks.remove(task.code)
+            return self._timeline_calculator._calendar.next_working_day(day)
+
+        def _end_date_allocation_with_exclusion(self, day: date, allocation: int, resource: str = None) -> date:
+            calendar = self._timeline_calculator._resource_calendars.get(
+                resource, self._timeline_calculator._calendar)
+            return calendar.add_working_days(day, allocation)
+
+        def compute_original_resource_allocation(self, strategy=None) -> List[TimelineTaskWithResource]:
+            return self._compute_allocation(lambda task: task.original_estimate_hours, strategy)
+
+        def compute_remaining_resource_allocation(self, strategy=None) -> List[TimelineTaskWithResource]:
+            return self._compute_allocation(lambda task: task.remaining_estimate_hours, strategy)
+
+        def _compute_allocation(self, remaining_extractor: Callable[[Task], float],
+                                strategy=None) -> List[TimelineTaskWithResource]:
+            if not self._resources:
+                raise ValueError("At least one resource is required")
+            if strategy is None:
+                return self._allocate(self._scheduling_order(), remaining_extractor)
+            tasks = [self._task_repository.get(code)
+                     for code in self._dependency_graph.codes]
+            task_days = [self._task_days(remaining_extractor(task))
+                         for task in tasks]
+            with phase(self._stats, "allocation_order"):
+                order = strategy.allocation_order(AllocationProblem(dependency_graph=self._dependency_graph,
+                                                                    task_days=task_days,
+                                                                    cost=lambda order: self._allocation_cost(order, task_days)))
+            if self._stats is not None:
+                self._stats.count("ready_set_rounds",
+                                  self._dependency_graph.rounds(order))
+            return self._allocate([tasks[index] for index in order], remaining_extractor)
+
+        def _allocation_cost(self, order: List[int], task_days: List[int]) -> Tuple[int, int]:
+            # Same allocation as _allocate, keeping only the end dates. Orders
+            # are often evaluated one after the other with a common prefix, so
+            # the state of the resources is saved every few tasks and the
+            # allocation is replayed from the last state saved in the prefix
+            # shared with the previous order.
+            calendar = self._timeline_calculator._calendar
+            resource_calendars = self._timeline_calculator._resource_calendars
+            start_date = self._timeline_calculator._start_date
+            previous = self._cost_state
+            if previous is None or len(previous.ends) != len(task_days):
+                previous = self._cost_state = self.CostState(order=[], ends=[None] * len(task_days),
+                                                             checkpoints=[])
+            shared = 0
+            for shared, (index, previous_index) in enumerate(zip(order, previous.order)):
+                if index != previous_index:
+                    break
+            else:
+                shared = min(len(order), len(previous.order))
+            del previous.checkpoints[shared // self.COST_CHECKPOINT_INTERVAL + 1:]
+            resource_pool = self._resource_pool()
+            if previous.checkpoints:
+                position, availability, last_end, total_end = previous.checkpoints[-1]
+                resource_pool.restore(availability)
+            else:
+                position, last_end, total_end = 0, start_date, 0
+            if self._stats is not None:
+                self._stats.count("cost_evaluations")
+                self._stats.count("cost_replayed_tasks", len(order) - position)
+            first_day = calendar.next_working_day(start_date)
+            offsets = self._dependency_graph.blocked_by_offsets
+            blockers = self._dependency_graph.blocked_by_targets
+            ends = previous.ends
+            for position in range(position, len(order)):
+                if position % self.COST_CHECKPOINT_INTERVAL == 0 and \
+                        len(previous.checkpoints) == position // self.COST_CHECKPOINT_INTERVAL:
+                    previous.checkpoints.append(
+                        (position, resource_pool.availability(), last_end, total_end))
+                index = order[position]
+                prospected_start_date = first_day
+                for blocker in blockers[offsets[index]:offsets[index + 1]]:
+                    if prospected_start_date < ends[blocker]:
+                        prospected_start_date = ends[blocker]
+                prospected_start_date = calendar.next_working_day(
+                    prospected_start_date)
+                slot, available = resource_pool.acquire(prospected_start_date)
+                start = available if available >= prospected_start_date else prospected_start_date
+                resource_calendar = resource_calendars.get(
+                    resource_pool.resource(slot))
+                if resource_calendar is None:
+                    end = calendar.add_working_days(start, task_days[index])
+                else:
+                    end = resource_calendar.add_working_days(
+                        resource_calendar.next_working_day(start), task_days[index])
+                resource_pool.release(slot, end)
+                ends[index] = end
+                total_end += end.toordinal()
+                if last_end < end:
+                    last_end = end
+            previous.order = order
+            return calendar.working_days_between(start_date, last_end), total_end
+
+        def _resume_allocation(self, allocated: List[Tuple[TimelineTaskWithResource, int]], tasks: List[Task],
+                               remaining_extractor: Callable[[Task], float]) -> List[TimelineTaskWithResource]:
+            # Continues an allocation after the given tasks, allocated in
+            # order to the given slots.
+            slot_availability = {}
+            for allocated_task, slot in allocated:
+                self._resources_state.allocated_task[allocated_task.code] = allocated_task
+                self._resources_state.allocated_slot[allocated_task.code] = slot
+                slot_availability[slot] = allocated_task.end
+            self._resources_state.resource_pool.restore(slot_availability)
+            return self._allocate(tasks, remaining_extractor)
+
+        def _allocate(self, tasks: List[Task], remaining_extractor: Callable[[Task], float]) -> List[TimelineTaskWithResource]:
+            for task in tasks:
+                prospected_task_start_date = self._get_start_date_for_resource(
+                    task)
+                available_slot, resource_availability_date = self._resources_state.resource_pool.acquire(
+                    prospected_task_start_date)
+                available_resource = self._resources_state.resource_pool.resource(
+                    available_slot)
+                task_start_date = resource_availability_date if resource_availability_date >= prospected_task_start_date else prospected_task_start_date
+                resource_calendar = self._timeline_calculator._resource_calendars.get(
+                    available_resource)
+                if resource_calendar is not None:
+                    # Tasks start on a working day of the resource.
+                    task_start_date = resource_calendar.next_working_day(
+                        task_start_date)
+                task_days = self._task_days(remaining_extractor(task))
+                task_end = self._end_date_allocation_with_exclusion(
+                    task_start_date, task_days, available_resource)
+                self._resources_state.resource_pool.release(
+                    available_slot, task_end)
+                self._resources_state.allocated_slot[task.code] = available_slot
+                self._resources_state.allocated_task[task.code] = TimelineTaskWithResource(code=task.code,
+                                                                                           resource=available_resource,
+                                                                                           description=task.description,
+                                                                                           link=task.link,
+                                                                                           start=task_start_date,
+                                                                                           end=task_end)
+            if self._stats is not None:
+                self._stats.count("scheduled_tasks", len(tasks))
             return list(self._resources_state.allocated_task.values())
 
         def _get_start_date_for_resource(self, task: Task):
             is_caused_by_timelines = filter(lambda o: o, map(lambda code: self._resources_state.allocated_task[code] if code in self._resources_state.allocated_task else None,
-                                                             self._is_blocked_by[task.code]))
+                                                             self._dependency_graph.blockers(task.code)))
             max_end_date = functools.reduce(lambda x, y: y if x < y else x,
                                             map(lambda timeline: timeline.end,
                                                 is_caused_by_timelines),
                                             self._get_next_available_date(self._timeline_calculator._start_date))
             return self._get_next_available_date(max_end_date)
 
-        def _find_available_resource(self, prospected_start_date: date) -> str:
-            def find_resource_available_at_prospected() -> str:
-                minimum_available = None
-                matching_resource = None
-                for resource, available in self._resources_state.resource_availability.items():
-                    if available <= prospected_start_date:
-                        if not minimum_available or available < minimum_available:
-                            minimum_available = available
-                            matching_resource = resource
-                return matching_resource
-
-            def find_first_resource_available() -> str:
-                minimum_available = None
-                matching_resource = None
-                for resource, available in self._resources_state.resource_availability.items():
-                    if not minimum_available or available <= minimum_available:
-                        matching_resource = resource
-                        minimum_available = available
-                return matching_resource
-
-            available_at_prospected = find_resource_available_at_prospected()
-            if available_at_prospected:
-                return available_at_prospected
-            else:
-                return find_first_resource_available()
-
 
-__all__ = ["Task", "TaskRepository", "TimelineTask", "TimelineCalculator"]
+class _BlockingLinks:
+    # Blocking links of a changing set of tasks. Links are indexed by target
+    # whether or not the target is a task, so that they apply as soon as the
+    # target is added.
+
+    def __init__(self, task_repository: TaskRepository):
+        self._blocks: Dict[str, List[str]] = {}
+        self._blocked_by: Dict[str, Set[str]] = {}
+        for code in task_repository.codes():
+            self._add(task_repository.get(code))
+
+    def blockers(self, code: str) -> List[str]:
+        return [blocker for blocker in self._blocked_by.get(code, ()) if blocker in self._blocks]
+
+    def apply(self, task_repository: TaskRepository, saved: Iterable[Task], removed: Iterable[str]) -> Set[str]:
+        # Applies the changes to the links and to the repository, returning
+        # the tasks whose estimate or blockers changed.
+        affected = set()
+        for code in removed:
+            affected.update(self._discard(code))
+            task_repository.remove(code)
+        for task in saved:
+            affected.update(self._discard(task.code))
+            self._add(task)
+            affected.add(task.code)
+            affected.update(self._blocks[task.code])
+            task_repository.save(task)
+        return {code for code in affected if code in self._blocks}
+
+    def downstream_order(self, codes: Set[str]) -> List[str]:
+        # Topological order of the given tasks and of every task they block
+        # directly or transitively.
+        downstream = set(codes)
+        to_visit = list(codes)
+        while to_visit:
+            for blocked in self._blocks[to_visit.pop()]:
+                if blocked in self._blocks and blocked not in downstream:
+                    downstream.add(blocked)
+                    to_visit.append(blocked)
+        remaining_blockers = {code: sum(1 for blocker in self.blockers(code) if blocker in downstream)
+                              for code in downstream}
+        ready = deque(
+            code for code in downstream if not remaining_blockers[code])
+        order = []
+        while ready:
+            code = ready.popleft()
+            order.append(code)
+            for blocked in self._blocks[code]:
+                if blocked in remaining_blockers:
+                    remaining_blockers[blocked] -= 1
+                    if not remaining_blockers[blocked]:
+                        ready.append(blocked)
+        if len(order) < len(downstream):
+            raise CyclicDependencyError(self._find_cycle(remaining_blockers))
+        return order
+
+    def _find_cycle(self, remaining_blockers: Dict[str, int]) -> List[str]:
+        code = next(c for c, blockers in remaining_blockers.items() if blockers)
+        path = []
+        position = {}
+        while code not in position:
+            position[code] = len(path)
+            path.append(code)
+            code = next(b for b in self.blockers(code)
+                        if remaining_blockers.get(b))
+        cycle = path[position[code]:]
+        cycle.reverse()
+        return cycle
+
+    def _add(self, task: Task):
+        self._blocks[task.code] = list(dict.fromkeys(task.blocks))
+        for blocked in self._blocks[task.code]:
+            self._blocked_by.setdefault(blocked, set()).add(task.code)
+
+    def _discard(self, code: str) -> List[str]:
+        blocks = self._blocks.pop(code, [])
+        for blocked in blocks:
+            self._blocked_by[blocked].discard(code)
+        return blocks
+
+
+class IncrementalTimeline:
+    # A timeline that is kept up to date with changes to the tasks: only the
+    # changed tasks and the tasks downstream of them are scheduled again,
+    # which gives the same timeline as computing it from scratch.
+
+    def __init__(self, timeline_calculator: TimelineCalculator, task_repository: TaskRepository,
+                 remaining_extractor: Callable[[Task], float]):
+        self._timeline_calculator = timeline_calculator
+        self._task_repository = task_repository
+        self._remaining_extractor = remaining_extractor
+        self._links = _BlockingLinks(task_repository)
+        helper = TimelineCalculator._CalculatorHelper(
+            timeline_calculator, task_repository, [])
+        helper._compute_timeline(remaining_extractor)
+        self._timeline = helper._result_timeline
+
+    def timeline(self) -> List[TimelineTask]:
+        return list(self._timeline.values())
+
+    def update(self, saved: Iterable[Task] = (), removed: Iterable[str] = ()) -> List[TimelineTask]:
+        # Saves and removes tasks in the repository, returning the timeline
+        # entries that were added or changed.
+        removed = list(removed)
+        affected = self._links.apply(self._task_repository, saved, removed)
+        order = self._links.downstream_order(affected)
+        for code in removed:
+            self._timeline.pop(code, None)
+        helper = TimelineCalculator._CalculatorHelper(self._timeline_calculator, self._task_repository, [],
+                                                      dependency_graph=self._links)
+        helper._result_timeline = self._timeline
+        changed = []
+        for code in order:
+            timeline_task = helper._schedule_task(
+                self._task_repository.get(code), self._remaining_extractor)
+            if self._timeline.get(code) != timeline_task:
+                self._timeline[code] = timeline_task
+                changed.append(timeline_task)
+        return changed
+
+
+class IncrementalResourceAllocation:
+    # A resource allocation that is kept up to date with changes to the
+    # tasks. The greedy allocation depends on the order tasks are allocated
+    # in, so the allocation is replayed from the first task in that order
+    # that changed or moved, which gives the same allocation as computing it
+    # from scratch.
+
+    def __init__(self, timeline_calculator: TimelineCalculator, task_repository: TaskRepository, resources: List[str],
+                 capacities: Optional[Dict[str, int]], remaining_extractor: Callable[[Task], float]):
+        self._timeline_calculator = timeline_calculator
+        self._task_repository = task_repository
+        self._resources = resources
+        self._capacities = capacities
+        self._remaining_extractor = remaining_extractor
+        self._order: List[str] = []
+        self._allocation: Dict[str, TimelineTaskWithResource] = {}
+        self._slots: Dict[str, int] = {}
+        self._allocate_from(set())
+
+    def allocation(self) -> List[TimelineTaskWithResource]:
+        return list(self._allocation.values())
+
+    def update(self, saved: Iterable[Task] = (), removed: Iterable[str] = ()) -> List[TimelineTaskWithResource]:
+        # Saves and removes tasks in the repository, returning the allocated
+        # tasks that were added or changed.
+        affected = set()
+        for code in removed:
+            task = self._task_repository.get(code)
+            if task:
+                affected.update(task.blocks)
+                self._task_repository.remove(code)
+        for task in saved:
+            previous_task = self._task_repository.get(task.code)
+            if previous_task:
+                affected.update(previous_task.blocks)
+            affected.update(task.blocks)
+            affected.add(task.code)
+            self._task_repository.save(task)
+        previous_allocation = self._allocation
+        self._allocate_from(affected)
+        return [allocated_task for code, allocated_task in self._allocation.items()
+                if previous_allocation.get(code) != allocated_task]
+
+    def _allocate_from(self, affected: Set[str]):
+        dependency_graph = self._task_repository.dependency_graph()
+        order = dependency_graph.topological_order()
+        unchanged = 0
+        while unchanged < min(len(order), len(self._order)) and order[unchanged] == self._order[unchanged] \
+                and order[unchanged] not in affected:
+            unchanged += 1
+        helper = TimelineCalculator._CalculatorHelper(self._timeline_calculator, self._task_repository, self._resources,
+                                                      self._capacities, dependency_graph)
+        if not self._resources:
+            raise ValueError("At least one resource is required")
+        helper._resume_allocation([(self._allocation[code], self._slots[code]) for code in order[:unchanged]],
+                                  [self._task_repository.get(code)
+                                   for code in order[unchanged:]],
+                                  self._remaining_extractor)
+        self._order = order
+        self._allocation = helper._resources_state.allocated_task
+        self._slots = helper._resources_state.allocated_slot
+
+
+__all__ = ["Task", "TaskRepository", "TimelineTask", "TimelineCalculator", "AllocationProblem",
+           "CyclicDependencyError", "DependencyGraph", "IncrementalTimeline", "IncrementalResourceAllocation"]
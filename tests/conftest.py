@@ -0,0 +1,107 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List
+import json
+import re
+import threading
+import time
+import pytest
+
+
+class JiraStub:
+    # Local Jira serving /rest/api/2/search over the given issues, keyed by
+    # issue key. Like Jira, it caps maxResults, returns only the requested
+    # fields and understands "key in (...)" and "updated >= -Nm" queries,
+    # issues counting as updated when changed through update. Requests and
+    # the bytes of the responses are recorded.
+
+    def __init__(self, issues: Dict[str, dict], max_results: int = 50):
+        self.issues = issues
+        self.max_results = max_results
+        self.requests: List[dict] = []
+        self.response_bytes = 0
+        self.updated_at: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), _handler(self))
+        self.url = f"http://127.0.0.1:{self._server.server_address[1]}"
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+
+    def search(self, body: dict) -> bytes:
+        keys = list(self.issues)
+        key_in = re.search(r"key in \(([^)]*)\)", body["jql"])
+        if key_in:
+            wanted = {key.strip().strip('"') for key in key_in.group(1).split(",")}
+            keys = [key for key in keys if key in wanted]
+        updated = re.search(r"updated >= -(\d+)m", body["jql"])
+        if updated:
+            since = time.time() - int(updated.group(1)) * 60
+            keys = [key for key in keys if self.updated_at.get(key, 0) >= since]
+        max_results = min(body["maxResults"], self.max_results)
+        page = keys[body["startAt"]:body["startAt"] + max_results]
+        data = json.dumps({"startAt": body["startAt"],
+                           "maxResults": max_results,
+                           "total": len(keys),
+                           "issues": [{"key": key,
+                                       "fields": {field: value for field, value in self.issues[key].items()
+                                                  if field in body["fields"]}}
+                                      for key in page]}).encode("utf-8")
+        with self._lock:
+            self.requests.append(body)
+            self.response_bytes += len(data)
+        return data
+
+    def update(self, key: str, **fields):
+        self.issues[key] = {**self.issues.get(key, {}), **fields}
+        self.updated_at[key] = time.time()
+
+    def close(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+def _handler(stub: JiraStub):
+
+    class Handler(BaseHTTPRequestHandler):
+
+        def do_POST(self):
+            if self.path != "/rest/api/2/search":
+                self.send_error(404)
+                return
+            data = stub.search(json.loads(
+                self.rfile.read(int(self.headers["Content-Length"]))))
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def make_issues(count: int, prefix: str = "P") -> Dict[str, dict]:
+    # A chain of issues, every one blocking the next, with fields that the
+    # planner does not need.
+    issues = {}
+    for i in range(count):
+        links = []
+        if i + 1 < count:
+            links.append({"type": {"name": "Blocks"},
+                          "outwardIssue": {"key": f"{prefix}-{i + 1}"}})
+        if i > 0:
+            links.append({"type": {"name": "Blocks"},
+                          "inwardIssue": {"key": f"{prefix}-{i - 1}"}})
+        issues[f"{prefix}-{i}"] = {"summary": f"Issue {i}",
+                                   "timeoriginalestimate": 8 * 3600,
+                                   "timeestimate": 4 * 3600,
+                                   "issuelinks": links,
+                                   "description": "x" * 1000}
+    return issues
+
+
+@pytest.fixture
+def jira():
+    stub = JiraStub(make_issues(120))
+    yield stub
+    stub.close()
@@ -0,0 +1,60 @@
+from allocation_strategies import GreedyAllocation, LocalSearchAllocation, LongestPathAllocation
+from compact_repository import CompactTaskRepository
+from tasks import TimelineCalculator
+from test_tasks import SKIPPED_WEEKDAYS, START_DATE, make_repository, random_tasks, skipped_dates
+import random
+import pytest
+
+
+def random_problem(seed):
+    rng = random.Random(seed)
+    tasks = random_tasks(rng, rng.randint(20, 80), rng.choice([0.02, 0.05, 0.1]))
+    calculator = TimelineCalculator(START_DATE, 8, skipped_dates(rng), SKIPPED_WEEKDAYS)
+    return calculator, tasks, make_repository(CompactTaskRepository, tasks), [f"R{i}" for i in range(rng.randint(1, 4))]
+
+
+def project_end(allocation):
+    return max(timeline_task.end for timeline_task in allocation)
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_local_search_with_seed_and_iterations_is_reproducible(seed):
+    calculator, _, repository, resources = random_problem(seed)
+
+    runs = [calculator.compute_original_resource_allocation(
+        repository, resources, strategy=LocalSearchAllocation(60, seed=seed, iterations=300)) for _ in range(2)]
+
+    assert runs[0] == runs[1]
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_local_search_is_never_worse_than_greedy(seed):
+    calculator, _, repository, resources = random_problem(seed)
+    strategy = LocalSearchAllocation(60, seed=seed, iterations=300)
+
+    allocation = calculator.compute_original_resource_allocation(repository, resources, strategy=strategy)
+
+    assert strategy.iterations == 300
+    assert strategy.makespan <= strategy.greedy_makespan
+    assert project_end(allocation) <= project_end(calculator.compute_original_resource_allocation(
+        repository, resources, strategy=GreedyAllocation()))
+
+
+@pytest.mark.parametrize("strategy", [GreedyAllocation, LongestPathAllocation,
+                                      lambda: LocalSearchAllocation(60, iterations=300)])
+@pytest.mark.parametrize("seed", range(10))
+def test_allocations_respect_blockers_and_resources(strategy, seed):
+    calculator, tasks, repository, resources = random_problem(seed)
+
+    allocation = {timeline_task.code: timeline_task for timeline_task in calculator.compute_original_resource_allocation(
+        repository, resources, strategy=strategy())}
+
+    assert set(allocation) == {task.code for task in tasks}
+    for task in tasks:
+        for blocked in task.blocks:
+            if blocked in allocation:
+                assert allocation[task.code].end <= allocation[blocked].start
+    for resource in resources:
+        busy = sorted((timeline_task.start, timeline_task.end) for timeline_task in allocation.values()
+                      if timeline_task.resource == resource and timeline_task.start < timeline_task.end)
+        assert all(end <= start for (_, end), (start, _) in zip(busy, busy[1:]))
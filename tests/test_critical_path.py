@@ -0,0 +1,28 @@
+from compact_repository import CompactTaskRepository
+from tasks import TaskRepository, TimelineCalculator
+from test_tasks import SKIPPED_WEEKDAYS, START_DATE, make_repository, random_tasks, skipped_dates
+import random
+import pytest
+
+
+@pytest.mark.parametrize("repository_type", [TaskRepository, CompactTaskRepository])
+@pytest.mark.parametrize("seed", range(20))
+def test_critical_path_matches_timeline(repository_type, seed):
+    rng = random.Random(seed)
+    tasks = random_tasks(rng, rng.randint(1, 60), rng.choice([0.01, 0.05, 0.2]))
+    calculator = TimelineCalculator(START_DATE, 8, skipped_dates(rng), SKIPPED_WEEKDAYS)
+    repository = make_repository(repository_type, tasks)
+
+    for timeline, critical_path in [(calculator.compute_original_timeline(repository),
+                                     calculator.compute_original_critical_path(repository)),
+                                    (calculator.compute_remaining_timeline(repository),
+                                     calculator.compute_remaining_critical_path(repository))]:
+        timeline = {timeline_task.code: timeline_task for timeline_task in timeline}
+        project_end = max(timeline_task.end for timeline_task in timeline.values())
+
+        assert {task.code for task in critical_path} == set(timeline)
+        for task in critical_path:
+            assert (task.earliest_start, task.earliest_end) == (timeline[task.code].start, timeline[task.code].end)
+            assert task.total_float >= 0
+            assert task.critical == (task.total_float == 0)
+        assert any(task.critical and task.earliest_end == project_end for task in critical_path)
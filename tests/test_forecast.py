@@ -0,0 +1,57 @@
+from compact_repository import CompactTaskRepository
+from datetime import date, timedelta
+from forecast import EndHistogram
+from tasks import Task, TimelineCalculator
+import numpy as np
+import random
+import pytest
+
+START_DATE = date(2024, 1, 3)
+
+
+def random_repository(rng: random.Random, count: int):
+    repository = CompactTaskRepository()
+    for i in range(count):
+        repository.save(Task(f"T{i}", [f"T{j}" for j in range(i + 1, min(count, i + 20)) if rng.random() < 0.1],
+                             original_estimate_hours=rng.choice([0, 3, 8, 16, 50])))
+    return repository
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_forecast_without_spread_matches_timeline(seed):
+    rng = random.Random(seed)
+    repository = random_repository(rng, rng.randint(1, 200))
+    calculator = TimelineCalculator(START_DATE, 8, [START_DATE + timedelta(days=rng.randint(0, 100)) for _ in range(20)],
+                                    [5, 6])
+    ends = {timeline_task.code: timeline_task.end for timeline_task in calculator.compute_original_timeline(repository)}
+
+    forecast = calculator.forecast_original_timeline(repository, 7, spread=0)
+
+    assert all(set(task.end.values()) == {ends[task.code]} for task in forecast.tasks)
+    assert set(forecast.project_end.values()) == {max(ends.values())}
+
+
+def test_forecast_does_not_depend_on_workers():
+    repository = random_repository(random.Random(0), 100)
+    calculator = TimelineCalculator(START_DATE, 8, [], [5, 6])
+
+    serial = calculator.forecast_original_timeline(repository, 1200, seed=3)
+    parallel = calculator.forecast_original_timeline(repository, 1200, seed=3, workers=2)
+
+    assert serial == parallel
+
+
+def test_end_histogram_percentiles_match_sorted_samples():
+    rng = np.random.default_rng(0)
+    # Rows far apart and spreading out, added in batches.
+    batches = [(np.arange(50)[:, None] * 1000 + rng.integers(0, 30 + 10 * batch, (50, 40))).astype(np.int32)
+               for batch in range(6)]
+    histogram = EndHistogram(50)
+    for codes in batches:
+        histogram.add(codes)
+    samples = np.sort(np.concatenate(batches, axis=1), axis=1)
+
+    percentile_codes = histogram.percentile_codes(samples.shape[1], (1, 50, 80, 95, 100))
+
+    for percentile, codes in percentile_codes.items():
+        assert codes.tolist() == samples[:, int(np.ceil(samples.shape[1] * percentile / 100)) - 1].tolist()
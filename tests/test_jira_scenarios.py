@@ -0,0 +1,57 @@
+from argparse import Namespace
+from jira_scenarios import make_scenarios, run_scenarios, write_table
+from tasks import TaskRepository, TimelineCalculator
+from test_tasks import SKIPPED_WEEKDAYS, make_repository, random_tasks
+from working_calendar import WorkingCalendar
+import io
+import random
+import pytest
+
+
+@pytest.fixture(scope="module")
+def tasks():
+    return random_tasks(random.Random(0), 60, 0.05)
+
+
+@pytest.fixture(scope="module")
+def scenarios():
+    return make_scenarios(Namespace(resource_counts=["1", "3"], resources=[], modes=["original", "remaining"],
+                                    start_dates=["2024-01-03", "2024-02-05"], holiday_sets=["", "2024-01-10,2024-02-06"],
+                                    exclude=["2024-01-04"]))
+
+
+def table(results):
+    output = io.StringIO()
+    write_table(results, output)
+    return output.getvalue()
+
+
+def test_workers_give_the_same_table(tasks, scenarios):
+    in_process = run_scenarios(tasks, scenarios, 8, SKIPPED_WEEKDAYS, workers=0)
+
+    assert len(in_process) == 16
+    assert run_scenarios(tasks, scenarios, 8, SKIPPED_WEEKDAYS, workers=1) == in_process
+    assert table(run_scenarios(tasks, scenarios, 8, SKIPPED_WEEKDAYS, workers=2)) == table(in_process)
+
+
+def test_scenarios_match_direct_timeline_runs(tasks, scenarios):
+    results = run_scenarios(tasks, scenarios, 8, SKIPPED_WEEKDAYS, workers=2)
+
+    for scenario, result in zip(scenarios, results):
+        repository = make_repository(TaskRepository, tasks)
+        calculator = TimelineCalculator(scenario.start_date, 8, scenario.excluded_dates, SKIPPED_WEEKDAYS)
+        if scenario.mode == "original":
+            allocation = calculator.compute_original_resource_allocation(repository, scenario.resources)
+            timeline = calculator.compute_original_timeline(repository)
+        else:
+            allocation = calculator.compute_remaining_resource_allocation(repository, scenario.resources)
+            timeline = calculator.compute_remaining_timeline(repository)
+        calendar = WorkingCalendar(scenario.start_date, scenario.excluded_dates, SKIPPED_WEEKDAYS)
+        end = max(timeline_task.end for timeline_task in allocation)
+        busy = sum(calendar.working_days_between(timeline_task.start, timeline_task.end) for timeline_task in allocation)
+
+        assert result.scenario == scenario
+        assert result.end == end
+        assert result.makespan == calendar.working_days_between(scenario.start_date, end)
+        assert result.dependency_end == max(timeline_task.end for timeline_task in timeline)
+        assert result.utilization == pytest.approx(busy / (result.makespan * len(scenario.resources)))
@@ -0,0 +1,53 @@
+from jira_task_extraction import FetchStats, TASK_FIELDS, extract_tasks_from_search, make_session, search_issues
+
+
+def test_search_follows_page_size_capped_by_server(jira):
+    issues = search_issues(make_session("user", "password", 4), jira.url, "project = P", TASK_FIELDS,
+                           page_size=100, concurrency=4)
+
+    assert [issue["key"] for issue in issues] == list(jira.issues)
+    # The first page is fetched alone, the others concurrently.
+    assert (jira.requests[0]["startAt"], jira.requests[0]["maxResults"]) == (0, 100)
+    assert sorted((request["startAt"], request["maxResults"]) for request in jira.requests[1:]) == [(50, 50), (100, 50)]
+
+
+def test_search_asks_only_for_task_fields(jira):
+    issues = search_issues(make_session("user", "password", 4), jira.url, "project = P", TASK_FIELDS,
+                           page_size=100, concurrency=4)
+
+    assert all(request["fields"] == TASK_FIELDS for request in jira.requests)
+    assert all(set(issue["fields"]) == set(TASK_FIELDS) for issue in issues)
+
+
+def test_fetch_stats_count_issues_pages_and_bytes(jira):
+    stats = FetchStats()
+
+    search_issues(make_session("user", "password", 4), jira.url, "project = P", TASK_FIELDS,
+                  page_size=100, concurrency=4, stats=stats)
+
+    assert stats.issues == 120
+    assert stats.pages == 3
+    assert stats.bytes == jira.response_bytes
+    assert stats.elapsed_seconds > 0
+
+
+def test_extract_tasks_from_search(jira):
+    tasks = extract_tasks_from_search("user", "password", jira.url, "project = P", ["Blocks"], page_size=30)
+
+    assert len(tasks) == 120
+    assert tasks[0].code == "P-0"
+    assert tasks[0].blocks == ["P-1"]
+    assert tasks[-1].blocks == []
+    assert tasks[0].original_estimate_hours == 8
+    assert tasks[0].remaining_estimate_hours == 4
+    assert tasks[0].link == f"{jira.url}/browse/P-0"
+
+
+def test_crawl_stops_at_budget(jira):
+    def crawl(crawl_budget):
+        return [task.code for task in extract_tasks_from_search("user", "password", jira.url, 'key in ("P-0")', ["Blocks"],
+                                                                crawl_depth=5, crawl_budget=crawl_budget)]
+
+    assert crawl(0) == ["P-0"]
+    assert crawl(3) == ["P-0", "P-1", "P-2", "P-3"]
+    assert crawl(None) == ["P-0", "P-1", "P-2", "P-3", "P-4", "P-5"]
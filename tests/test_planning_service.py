@@ -0,0 +1,84 @@
+from datetime import date
+from jira_task_extraction import extract_tasks_from_search
+from planning_service import PlanRequest, PlanningService, make_server
+from urllib.request import urlopen
+import json
+import threading
+import pytest
+
+START_DATE = date(2024, 1, 1)
+
+
+def plan_request(mode: str = "original", resources=(), excluded_dates=()) -> PlanRequest:
+    return PlanRequest(query="project = P", mode=mode, start_date=START_DATE,
+                       calendar=(tuple(excluded_dates), (5, 6)), resources=tuple(resources))
+
+
+@pytest.fixture
+def service(jira):
+    return PlanningService(lambda query: extract_tasks_from_search("user", "password", jira.url, query, ["Blocks"]),
+                           results=3)
+
+
+def test_timelines_are_cached_by_request(service):
+    first = service.timeline(plan_request())
+    service.timeline(plan_request("remaining"))
+    service.timeline(plan_request(resources=["alice", "bob"]))
+
+    assert service.timeline(plan_request()) is first
+    assert service.summary() == {"hits": 1, "misses": 3, "syncs": 1, "invalidations": 0, "queries": 1, "results": 3}
+
+
+def test_least_recently_used_timeline_is_dropped(service):
+    first = service.timeline(plan_request())
+    service.timeline(plan_request("remaining"))
+    service.timeline(plan_request(resources=["alice"]))
+    service.timeline(plan_request())
+    service.timeline(plan_request(excluded_dates=[date(2024, 1, 2)]))
+
+    assert service.timeline(plan_request()) is first
+    service.timeline(plan_request("remaining"))
+    assert service.summary()["hits"] == 2
+    assert service.summary()["misses"] == 5
+    assert service.summary()["results"] == 3
+
+
+def test_refresh_drops_timelines_of_changed_issues(service, jira):
+    before = {timeline_task.code: timeline_task for timeline_task in service.timeline(plan_request())}
+
+    assert service.refresh() == []
+    assert service.timeline(plan_request()) is not None
+    assert service.summary()["hits"] == 1
+
+    jira.issues["P-0"]["timeoriginalestimate"] = 80 * 3600
+    assert service.refresh() == ["project = P"]
+    after = {timeline_task.code: timeline_task for timeline_task in service.timeline(plan_request())}
+
+    assert after["P-0"].end > before["P-0"].end
+    assert service.summary() == {"hits": 1, "misses": 2, "syncs": 3, "invalidations": 1, "queries": 1, "results": 1}
+
+
+def test_calendars_are_computed_concurrently(service):
+    service.timeline(plan_request())
+    busy = service._calculator(START_DATE, plan_request().calendar)
+    computed = threading.Event()
+
+    with busy.lock:
+        threading.Thread(target=lambda: (service.timeline(plan_request(excluded_dates=[date(2024, 1, 2)])),
+                                         computed.set()), daemon=True).start()
+        assert computed.wait(10)
+
+
+def test_server_renders_timelines_and_stats(service):
+    server = make_server(service)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}"
+    try:
+        with urlopen(f"{url}/gantt?jql=project%20%3D%20P&start_date=2024-01-01&format=json") as response:
+            assert response.headers["Content-Type"] == "application/json"
+            assert len(json.load(response)) == 120
+        with urlopen(f"{url}/stats") as response:
+            assert json.load(response)["misses"] == 1
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,89 @@
+from datetime import date
+from rendering import COLLAPSED_SUMMARY_CODES, Chart, _ical_fold, collapse, render_text
+import csv
+import io
+import json
+import pytest
+
+COLUMNS = {"JiraID": ["P-1", "P-2"],
+           "Summary": ["First, \"quoted\"", None],
+           "Start": [date(2024, 1, 3), date(2024, 1, 5)],
+           "End": [date(2024, 1, 5), date(2024, 1, 5)],
+           "Link": ["https://jira/browse/P-1", None],
+           "Resource": ["alice", "bob"]}
+
+
+@pytest.mark.parametrize("text", ["a" * 74, "a" * 75, "a" * 76, "a" * 149, "a" * 150, "a" * 151, "a" * 400,
+                                  "é" * 100, "a" + "€" * 60, "x" + "😀" * 50, "SUMMARY:" + "Ünïcödé ✓ " * 30])
+def test_ical_lines_fold_at_75_octets(text):
+    folded = _ical_fold(text)
+
+    assert folded.endswith("\r\n")
+    lines = folded[:-2].split("\r\n")
+    assert all(len(line.encode("utf-8")) <= 75 for line in lines)
+    assert all(line.startswith(" ") for line in lines[1:])
+    assert all(len(line.encode("utf-8")) > 71 for line in lines[:-1])
+    assert "".join(line[1:] if i else line for i, line in enumerate(lines)) == text
+
+
+def test_ical_events_are_folded_and_escaped():
+    columns = dict(COLUMNS, Summary=["Long; summary, " + "ü" * 80, None])
+
+    text = render_text(columns, Chart(y="JiraID", hover=[]), "ics")
+
+    assert all(len(line.encode("utf-8")) <= 75 for line in text.split("\r\n"))
+    unfolded = text.replace("\r\n ", "")
+    assert "SUMMARY:P-1 Long\\; summary\\, " + "ü" * 80 + "\r\n" in unfolded
+    assert "SUMMARY:P-2\r\n" in unfolded
+    assert "DTSTART;VALUE=DATE:20240105\r\nDTEND;VALUE=DATE:20240106\r\n" in unfolded
+
+
+def test_collapse_merges_overlapping_and_touching_tasks():
+    columns = {"JiraID": ["A-1", "A-2", "A-3", "B-1", "A-4"],
+               "Summary": ["", "", "", "", ""],
+               "Start": [date(2024, 1, 1), date(2024, 1, 3), date(2024, 1, 8), date(2024, 1, 1), date(2024, 1, 6)],
+               "End": [date(2024, 1, 4), date(2024, 1, 6), date(2024, 1, 9), date(2024, 1, 20), date(2024, 1, 6)],
+               "Link": [None] * 5,
+               "Resource": ["a", "a", "a", "b", "a"]}
+
+    collapsed, chart = collapse(columns, Chart(y="Resource", hover=["Summary"], color="Resource"),
+                                columns["Resource"])
+
+    assert collapsed["JiraID"] == ["a", "a", "b"]
+    assert collapsed["Resource"] == ["a", "a", "b"]
+    assert collapsed["Start"] == [date(2024, 1, 1), date(2024, 1, 8), date(2024, 1, 1)]
+    assert collapsed["End"] == [date(2024, 1, 6), date(2024, 1, 9), date(2024, 1, 20)]
+    assert collapsed["Summary"] == ["3 tasks: A-1, A-2, A-4", "1 task: A-3", "1 task: B-1"]
+    assert (chart.y, chart.hover, chart.color) == ("Resource", ["Summary"], "Resource")
+
+
+def test_collapse_lists_a_limited_number_of_codes():
+    count = COLLAPSED_SUMMARY_CODES + 2
+    columns = {"JiraID": [f"P-{i}" for i in range(count)],
+               "Summary": [""] * count,
+               "Start": [date(2024, 1, 1)] * count,
+               "End": [date(2024, 1, 2)] * count,
+               "Link": [None] * count}
+
+    collapsed, _ = collapse(columns, Chart(y="JiraID", hover=[]), ["all"] * count)
+
+    assert collapsed["Summary"] == [f"{count} tasks: " + ", ".join(f"P-{i}" for i in range(COLLAPSED_SUMMARY_CODES))
+                                    + ", ..."]
+    assert set(collapsed) == {"JiraID", "Summary", "Start", "End", "Link"}
+
+
+def test_csv_rows_have_one_column_per_field():
+    rows = list(csv.reader(io.StringIO(render_text(COLUMNS, Chart(y="JiraID", hover=[]), "csv"))))
+
+    assert rows == [["JiraID", "Summary", "Start", "End", "Link", "Resource"],
+                    ["P-1", "First, \"quoted\"", "2024-01-03", "2024-01-05", "https://jira/browse/P-1", "alice"],
+                    ["P-2", "", "2024-01-05", "2024-01-05", "", "bob"]]
+
+
+def test_json_rows_are_objects_keyed_by_field():
+    rows = json.loads(render_text(COLUMNS, Chart(y="JiraID", hover=[]), "json"))
+
+    assert rows == [{"JiraID": "P-1", "Summary": "First, \"quoted\"", "Start": "2024-01-03", "End": "2024-01-05",
+                     "Link": "https://jira/browse/P-1", "Resource": "alice"},
+                    {"JiraID": "P-2", "Summary": None, "Start": "2024-01-05", "End": "2024-01-05",
+                     "Link": None, "Resource": "bob"}]
@@ -0,0 +1,75 @@
+from datetime import date, timedelta
+from resource_pool import ResourcePool
+import pytest
+
+START_DATE = date(2024, 1, 3)
+
+
+def test_capacities_expand_resources_into_slots():
+    pool = ResourcePool(["a", "b", "a"], START_DATE, {"a": 2})
+
+    assert sorted(pool.availability()) == [0, 1, 2]
+    assert [pool.resource(slot) for slot in range(3)] == ["a", "a", "b"]
+
+
+def test_capacity_below_one_is_rejected():
+    with pytest.raises(ValueError):
+        ResourcePool(["a", "b"], START_DATE, {"b": 0})
+
+
+def test_acquire_prefers_first_listed_slot_when_free():
+    pool = ResourcePool(["a", "b", "c"], START_DATE)
+
+    assert pool.acquire(START_DATE) == (0, START_DATE)
+    assert pool.acquire(START_DATE) == (1, START_DATE)
+
+
+def test_acquire_prefers_last_listed_slot_when_only_free_later():
+    pool = ResourcePool(["a", "b", "c"], START_DATE)
+    later = START_DATE + timedelta(days=5)
+    for slot in range(3):
+        assert pool.acquire(START_DATE) == (slot, START_DATE)
+    for slot in range(3):
+        pool.release(slot, later)
+
+    assert pool.acquire(START_DATE) == (2, later)
+    assert pool.acquire(later) == (0, later)
+    assert pool.acquire(START_DATE) == (1, later)
+
+
+def test_acquire_picks_earliest_available_slot():
+    pool = ResourcePool(["a", "b"], START_DATE)
+    pool.acquire(START_DATE)
+    pool.acquire(START_DATE)
+    pool.release(0, START_DATE + timedelta(days=3))
+    pool.release(1, START_DATE + timedelta(days=1))
+
+    assert pool.acquire(START_DATE + timedelta(days=10)) == (1, START_DATE + timedelta(days=1))
+
+
+def test_restore_sets_availability_of_given_slots():
+    pool = ResourcePool(["a", "b", "c"], START_DATE)
+    later = START_DATE + timedelta(days=2)
+
+    pool.restore({1: later})
+
+    assert pool.availability() == {0: START_DATE, 1: later, 2: START_DATE}
+    assert pool.acquire(START_DATE) == (0, START_DATE)
+    assert pool.acquire(START_DATE) == (2, START_DATE)
+    assert pool.acquire(START_DATE) == (1, later)
+
+
+def test_many_slots_on_one_date_keep_the_listed_order():
+    count = 1000
+    pool = ResourcePool(["r"], START_DATE, {"r": count})
+    later = START_DATE + timedelta(days=1)
+    for slot in range(count):
+        assert pool.acquire(START_DATE) == (slot, START_DATE)
+    for slot in reversed(range(count)):
+        pool.release(slot, later)
+
+    acquired = [pool.acquire(later)[0] if slot % 2 else pool.acquire(START_DATE)[0] for slot in range(count)]
+
+    assert acquired[0::2] == list(reversed(range(count // 2, count)))
+    assert acquired[1::2] == list(range(count // 2))
+    assert pool.availability() == {}
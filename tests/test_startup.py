@@ -0,0 +1,14 @@
+import os
+import subprocess
+import sys
+
+JIRA_CLI = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "jira_cli.py")
+
+
+def test_help_does_not_import_heavy_modules():
+    imports = subprocess.run([sys.executable, "-X", "importtime", JIRA_CLI, "gantt", "--help"], capture_output=True,
+                             text=True, check=True).stderr
+    imported = {line.rpartition("|")[2].strip().split(".")[0] for line in imports.splitlines()}
+
+    assert "argparse" in imported
+    assert imported.isdisjoint({"numpy", "pyarrow", "matplotlib", "plotly", "requests", "pandas"})
@@ -0,0 +1,118 @@
+from task_cache import TaskCache, sync_tasks_from_search
+import sqlite3
+import pytest
+
+
+def sync(cache, jira, **kwargs):
+    return sync_tasks_from_search(cache, "user", "password", jira.url, "project = P", ["Blocks"], page_size=100, **kwargs)
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = TaskCache(str(tmp_path))
+    yield cache
+    cache.close()
+
+
+def test_first_sync_fetches_and_stores_all_issues(cache, jira):
+    tasks = sync(cache, jira)
+
+    assert [task.code for task in tasks] == list(jira.issues)
+    assert len(jira.requests) == 3
+    assert [cached_task.task for cached_task in cache.load(jira.url, "project = P", {"dependency_types": ["Blocks"],
+                                                                                      "crawl_depth": 0,
+                                                                                      "crawl_budget": None})[1]] == tasks
+
+
+def test_sync_without_changes_fetches_only_keys(cache, jira):
+    tasks = sync(cache, jira)
+    jira.requests.clear()
+
+    assert sync(cache, jira) == tasks
+    updated, *keys_only = jira.requests
+    assert "updated >= -" in updated["jql"]
+    assert updated["fields"] != ["key"]
+    assert [request["fields"] for request in keys_only] == [["key"]] * 3
+
+
+def test_sync_fetches_updated_issues(cache, jira):
+    sync(cache, jira)
+    jira.update("P-5", summary="Changed", timeoriginalestimate=16 * 3600)
+    jira.requests.clear()
+
+    tasks = sync(cache, jira)
+
+    changed = next(task for task in tasks if task.code == "P-5")
+    assert (changed.description, changed.original_estimate_hours) == ("Changed", 16)
+    assert len(tasks) == 120
+    assert len(jira.requests) == 4
+
+
+def test_sync_drops_deleted_issues(cache, jira):
+    sync(cache, jira)
+    del jira.issues["P-7"]
+    jira.requests.clear()
+
+    tasks = sync(cache, jira)
+
+    assert [task.code for task in tasks] == list(jira.issues)
+    assert len(jira.requests) == 4
+
+
+def test_sync_fetches_issues_that_entered_the_search_without_update(cache, jira):
+    sync(cache, jira)
+    jira.issues["Q-1"] = {"summary": "Moved", "timeoriginalestimate": 3600, "issuelinks": []}
+    jira.requests.clear()
+
+    tasks = sync(cache, jira)
+
+    assert tasks[-1].code == "Q-1"
+    assert tasks[-1].description == "Moved"
+    assert len(jira.requests) == 5
+    assert jira.requests[-1]["jql"] == 'key in ("Q-1")'
+
+
+def test_offline_uses_cache_without_requests(cache, jira):
+    tasks = sync(cache, jira)
+    jira.update("P-5", summary="Changed")
+    jira.requests.clear()
+
+    assert sync(cache, jira, offline=True) == tasks
+    assert jira.requests == []
+
+
+def test_offline_without_cache_fails(cache, jira):
+    with pytest.raises(ValueError):
+        sync(cache, jira, offline=True)
+    assert jira.requests == []
+
+
+def test_refresh_fetches_all_issues_again(cache, jira):
+    sync(cache, jira)
+    jira.issues["P-5"]["summary"] = "Changed without update"
+    jira.requests.clear()
+
+    tasks = sync(cache, jira, refresh=True)
+
+    assert next(task for task in tasks if task.code == "P-5").description == "Changed without update"
+    assert len(jira.requests) == 3
+    assert all("updated" not in request["jql"] for request in jira.requests)
+
+
+def test_schema_version_change_resets_cache(tmp_path, jira):
+    cache = TaskCache(str(tmp_path))
+    sync(cache, jira)
+    cache.close()
+    connection = sqlite3.connect(str(tmp_path / "tasks.sqlite3"))
+    connection.execute("PRAGMA user_version = 0")
+    connection.close()
+    jira.requests.clear()
+
+    cache = TaskCache(str(tmp_path))
+    try:
+        with pytest.raises(ValueError):
+            sync(cache, jira, offline=True)
+        assert len(sync(cache, jira)) == 120
+        assert len(jira.requests) == 3
+    finally:
+        cache.close()
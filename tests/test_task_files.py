@@ -0,0 +1,68 @@
+from compact_repository import CompactTaskRepository
+from jira_cli import parser
+from task_files import export_tasks, iter_tasks, load_tasks
+from tasks import Task
+import pytest
+
+TASKS = [Task("P-1", ["P-2", "EXT-1"], "First, with \"quotes\"\nand a new line", "https://jira/browse/P-1", 8, 4),
+         Task("P-2", [], "Ünïcode ✓", None, 0.5, 0),
+         Task("P-3", ["P-2"], None, None, 0, 0)]
+
+
+@pytest.mark.parametrize("extension", [".jsonl", ".ndjson", ".csv", ".parquet"])
+def test_export_then_load_gives_the_same_tasks(tmp_path, extension):
+    if extension == ".parquet":
+        pytest.importorskip("pyarrow")
+    path = str(tmp_path / f"tasks{extension}")
+
+    export_tasks(TASKS, path)
+
+    assert list(iter_tasks(path)) == TASKS
+    repository = load_tasks(path, CompactTaskRepository())
+    assert [repository.get(task.code) for task in TASKS] == TASKS
+
+
+def test_unsupported_extension_is_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        export_tasks(TASKS, str(tmp_path / "tasks.txt"))
+
+
+def test_jsonl_rows_without_code_are_rejected(tmp_path):
+    path = tmp_path / "tasks.jsonl"
+    path.write_text('{"code": "P-1"}\n\n{"blocks": ["P-1"]}\n', encoding="utf-8")
+
+    with pytest.raises(ValueError, match="without code"):
+        list(iter_tasks(str(path)))
+
+
+def test_jsonl_rows_that_are_not_json_are_rejected(tmp_path):
+    path = tmp_path / "tasks.jsonl"
+    path.write_text('{"code": "P-1"}\n{"code": "P-2",\n', encoding="utf-8")
+
+    with pytest.raises(ValueError):
+        list(iter_tasks(str(path)))
+
+
+@pytest.mark.parametrize("row", [",P-1,,,8,4", "P-1,,,,eight,4"])
+def test_malformed_csv_rows_are_rejected(tmp_path, row):
+    path = tmp_path / "tasks.csv"
+    path.write_text("code,blocks,description,link,original_estimate_hours,remaining_estimate_hours\n" + row + "\n",
+                    encoding="utf-8")
+
+    with pytest.raises(ValueError):
+        list(iter_tasks(str(path)))
+
+
+def test_csv_missing_optional_columns_default_to_empty(tmp_path):
+    path = tmp_path / "tasks.csv"
+    path.write_text("code,original_estimate_hours\nP-1,8\n", encoding="utf-8")
+
+    assert list(iter_tasks(str(path))) == [Task("P-1", [], None, None, 8, 0)]
+
+
+def test_export_file_is_rejected_with_input_file(tmp_path, capsys):
+    with pytest.raises(SystemExit):
+        parser(["gantt", "--start-date", "2024-01-03", "--input-file", str(tmp_path / "in.csv"),
+                "--export-file", str(tmp_path / "out.csv")])
+
+    assert "--export-file" in capsys.readouterr().err
@@ -0,0 +1,253 @@
+from compact_repository import CompactTaskRepository
+from datetime import date, timedelta
+from run_stats import RunStats
+from tasks import CyclicDependencyError, Task, TaskRepository, TimelineCalculator, TimelineTask, TimelineTaskWithResource
+import math
+import random
+import pytest
+
+START_DATE = date(2024, 1, 3)
+SKIPPED_WEEKDAYS = [5, 6]
+
+
+def random_tasks(rng: random.Random, count: int, link_probability: float):
+    # Tasks only block tasks saved later, so the graph has no cycles, and
+    # some block issues that are not tasks.
+    tasks = []
+    for i in range(count):
+        blocks = [f"T{j}" for j in range(i + 1, count) if rng.random() < link_probability]
+        if rng.random() < 0.05:
+            blocks.append("EXT-1")
+        tasks.append(Task(f"T{i}", blocks, f"Task {i}", None,
+                          rng.choice([0, 1, 4, 8, 9, 16, 40]), rng.choice([0, 2, 8, 24])))
+    rng.shuffle(tasks)
+    return tasks
+
+
+def make_repository(repository_type, tasks):
+    repository = repository_type()
+    for task in tasks:
+        repository.save(Task(task.code, list(task.blocks), task.description, task.link,
+                             task.original_estimate_hours, task.remaining_estimate_hours))
+    return repository
+
+
+def sorted_by_code(timeline_tasks):
+    return sorted(timeline_tasks, key=lambda timeline_task: timeline_task.code)
+
+
+def skipped_dates(rng: random.Random):
+    return [START_DATE + timedelta(days=rng.randint(0, 200)) for _ in range(30)]
+
+
+class ReferenceScheduler:
+    # The scheduler before the dependency graph and the working calendar:
+    # rounds of rescans for the tasks whose blockers are all scheduled, and
+    # dates stepped a day at a time. It scheduled the tasks of a round in
+    # set order, here they follow the given order.
+
+    def __init__(self, tasks, skipped):
+        self._tasks = {task.code: task for task in tasks}
+        self._blocked_by = {code: {task.code for task in tasks if code in task.blocks} for code in self._tasks}
+        self._skipped = set(skipped)
+
+    def timeline(self, hours):
+        timeline = {}
+        for task in (task for ready in self.rounds() for task in ready):
+            start = self._start(task, timeline)
+            timeline[task.code] = TimelineTask(task.code, task.description, task.link, start,
+                                               self._end(start, self._days(hours(task))))
+        return list(timeline.values())
+
+    def allocation(self, hours, resources, order):
+        position = {code: i for i, code in enumerate(order)}
+        availability = {resource: START_DATE for resource in resources}
+        allocation = {}
+        for task in (task for ready in self.rounds() for task in sorted(ready, key=lambda task: position[task.code])):
+            prospected = self._start(task, allocation)
+            resource = self._available_resource(availability, prospected)
+            start = max(availability[resource], prospected)
+            end = self._end(start, self._days(hours(task)))
+            availability[resource] = end
+            allocation[task.code] = TimelineTaskWithResource(task.code, resource, task.description, task.link,
+                                                             start, end)
+        return list(allocation.values())
+
+    def rounds(self):
+        scheduled = set()
+        while len(scheduled) < len(self._tasks):
+            ready = [task for code, task in self._tasks.items()
+                     if code not in scheduled and self._blocked_by[code] <= scheduled]
+            yield ready
+            scheduled.update(task.code for task in ready)
+
+    def _start(self, task, scheduled):
+        return self._next_working_day(max([self._next_working_day(START_DATE)] +
+                                          [scheduled[blocker].end for blocker in self._blocked_by[task.code]]))
+
+    def _available_resource(self, availability, prospected):
+        available = [resource for resource, day in availability.items() if day <= prospected]
+        if available:
+            return min(available, key=lambda resource: availability[resource])
+        return min(reversed(list(availability)), key=lambda resource: availability[resource])
+
+    def _days(self, hours):
+        return int(math.ceil(hours / 8))
+
+    def _excluded(self, day):
+        return day.weekday() in SKIPPED_WEEKDAYS or day in self._skipped
+
+    def _next_working_day(self, day):
+        while self._excluded(day):
+            day += timedelta(days=1)
+        return day
+
+    def _end(self, day, days):
+        while days:
+            if not self._excluded(day):
+                days -= 1
+            day += timedelta(days=1)
+        return day
+
+
+@pytest.mark.parametrize("repository_type", [TaskRepository, CompactTaskRepository])
+@pytest.mark.parametrize("seed", range(40))
+def test_schedule_matches_reference_scheduler(repository_type, seed):
+    rng = random.Random(seed)
+    tasks = random_tasks(rng, rng.randint(1, 60), rng.choice([0.01, 0.05, 0.2]))
+    skipped = skipped_dates(rng)
+    resources = [f"R{i}" for i in range(rng.randint(1, 5))]
+    calculator = TimelineCalculator(START_DATE, 8, skipped, SKIPPED_WEEKDAYS)
+    repository = make_repository(repository_type, tasks)
+    reference = ReferenceScheduler(tasks, skipped)
+
+    original_timeline = calculator.compute_original_timeline(repository)
+    order = [timeline_task.code for timeline_task in original_timeline]
+
+    assert order == [task.code for ready in reference.rounds()
+                     for task in sorted(ready, key=lambda task: order.index(task.code))]
+    assert sorted_by_code(original_timeline) == sorted_by_code(
+        reference.timeline(lambda task: task.original_estimate_hours))
+    assert sorted_by_code(calculator.compute_remaining_timeline(repository)) == sorted_by_code(
+        reference.timeline(lambda task: task.remaining_estimate_hours))
+    assert calculator.compute_original_resource_allocation(repository, resources) == reference.allocation(
+        lambda task: task.original_estimate_hours, resources, order)
+    assert calculator.compute_remaining_resource_allocation(repository, resources) == reference.allocation(
+        lambda task: task.remaining_estimate_hours, resources, order)
+
+
+@pytest.mark.parametrize("repository_type", [TaskRepository, CompactTaskRepository])
+def test_dependency_cycle_is_reported(repository_type):
+    repository = make_repository(repository_type, [Task("A", ["B"]), Task("B", ["C"]), Task("C", ["A"]),
+                                                   Task("D", ["A"])])
+
+    with pytest.raises(CyclicDependencyError) as error:
+        TimelineCalculator(START_DATE, 8).compute_original_timeline(repository)
+
+    assert sorted(error.value.cycle) == ["A", "B", "C"]
+
+
+def test_compact_repository_matches_repository_after_removals():
+    rng = random.Random(1)
+    tasks = random_tasks(rng, 50, 0.1)
+    repository = make_repository(TaskRepository, tasks)
+    compact_repository = make_repository(CompactTaskRepository, tasks)
+    for code in rng.sample(sorted(repository.codes()), 20) + ["EXT-1"]:
+        repository.remove(code)
+        compact_repository.remove(code)
+    for task in tasks[:5]:
+        repository.save(task)
+        compact_repository.save(task)
+
+    assert compact_repository.codes() == repository.codes()
+    assert all(compact_repository.get(code) == repository.get(code) for code in repository.codes())
+    assert compact_repository.dependency_graph().codes == repository.dependency_graph().codes
+    assert compact_repository.original_estimates() == repository.original_estimates()
+    calculator = TimelineCalculator(START_DATE, 8, [], SKIPPED_WEEKDAYS)
+    assert calculator.compute_original_resource_allocation(compact_repository, ["R0", "R1"]) == \
+        calculator.compute_original_resource_allocation(repository, ["R0", "R1"])
+
+
+def random_change(rng: random.Random, repository):
+    # Saved and removed tasks: a changed estimate, changed links, a new task
+    # or a removed one.
+    codes = sorted(repository.codes(), key=lambda code: int(code[1:]))
+    change = rng.random()
+    if codes and change < 0.3:
+        task = repository.get(rng.choice(codes))
+        task.original_estimate_hours = rng.choice([0, 8, 30])
+        task.remaining_estimate_hours = rng.choice([1, 16])
+        return [task], []
+    if codes and change < 0.55:
+        task = repository.get(rng.choice(codes))
+        later = [code for code in codes if int(code[1:]) > int(task.code[1:])]
+        task.blocks = rng.sample(later, min(len(later), rng.randint(0, 3)))
+        return [task], []
+    if codes and change < 0.8:
+        return [], [rng.choice(codes)]
+    code = f"T{int(codes[-1][1:]) + 1 if codes else 0}"
+    saved = [Task(code, [], original_estimate_hours=8, remaining_estimate_hours=4)]
+    if codes and rng.random() < 0.5:
+        task = repository.get(rng.choice(codes))
+        task.blocks = task.blocks + [code]
+        saved.append(task)
+    return saved, []
+
+
+@pytest.mark.parametrize("repository_type", [TaskRepository, CompactTaskRepository])
+@pytest.mark.parametrize("seed", range(30))
+def test_incremental_timeline_matches_full_computation(repository_type, seed):
+    rng = random.Random(seed)
+    repository = make_repository(repository_type, random_tasks(rng, rng.randint(2, 40), 0.1))
+    calculator = TimelineCalculator(START_DATE, 8, skipped_dates(rng), SKIPPED_WEEKDAYS)
+    incremental = calculator.incremental_original_timeline(repository)
+
+    for _ in range(8):
+        before = {timeline_task.code: timeline_task for timeline_task in incremental.timeline()}
+        changed = incremental.update(*random_change(rng, repository))
+        after = {timeline_task.code: timeline_task for timeline_task in incremental.timeline()}
+
+        assert sorted_by_code(after.values()) == sorted_by_code(calculator.compute_original_timeline(repository))
+        assert sorted_by_code(changed) == sorted_by_code(timeline_task for code, timeline_task in after.items()
+                                                         if before.get(code) != timeline_task)
+
+
+@pytest.mark.parametrize("repository_type", [TaskRepository, CompactTaskRepository])
+@pytest.mark.parametrize("seed", range(30))
+def test_incremental_allocation_matches_full_computation(repository_type, seed):
+    rng = random.Random(seed)
+    repository = make_repository(repository_type, random_tasks(rng, rng.randint(2, 40), 0.1))
+    calculator = TimelineCalculator(START_DATE, 8, skipped_dates(rng), SKIPPED_WEEKDAYS,
+                                    {"R1": skipped_dates(rng)})
+    resources, capacities = ["R0", "R1", "R2"], {"R0": 2}
+    incremental = calculator.incremental_remaining_resource_allocation(repository, resources, capacities)
+
+    for _ in range(8):
+        before = {allocated_task.code: allocated_task for allocated_task in incremental.allocation()}
+        changed = incremental.update(*random_change(rng, repository))
+        after = {allocated_task.code: allocated_task for allocated_task in incremental.allocation()}
+
+        assert sorted_by_code(after.values()) == sorted_by_code(
+            calculator.compute_remaining_resource_allocation(repository, resources, capacities))
+        assert sorted_by_code(changed) == sorted_by_code(allocated_task for code, allocated_task in after.items()
+                                                         if before.get(code) != allocated_task)
+
+
+def test_incremental_update_reports_new_cycle():
+    repository = make_repository(TaskRepository, [Task("A", ["B"]), Task("B", [])])
+    incremental = TimelineCalculator(START_DATE, 8).incremental_original_timeline(repository)
+
+    with pytest.raises(CyclicDependencyError):
+        incremental.update([Task("B", ["A"])])
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_ready_set_rounds_count_dependency_levels(seed):
+    rng = random.Random(seed)
+    tasks = random_tasks(rng, rng.randint(1, 60), 0.1)
+    stats = RunStats()
+
+    TimelineCalculator(START_DATE, 8, stats=stats).compute_original_timeline(make_repository(TaskRepository, tasks))
+
+    assert stats.counters["ready_set_rounds"] == len(list(ReferenceScheduler(tasks, []).rounds()))
+    assert stats.counters["scheduled_tasks"] == len(tasks)
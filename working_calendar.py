@@ -0,0 +1,81 @@
+from bisect import bisect_left
+from datetime import date
+from typing import Iterable, List, Optional
+
+
+class WorkingCalendar:
+
+    _MINIMUM_GROWTH_DAYS = 366
+
+    def __init__(self, start_date: date,
+                 skipped_dates: Optional[Iterable[date]] = None,
+                 skipped_weekdays: Optional[Iterable[int]] = None):
+        self._skipped_dates = frozenset(skipped_dates if skipped_dates else [])
+        self._skipped_weekdays = frozenset(
+            skipped_weekdays if skipped_weekdays else [])
+        if self._skipped_weekdays.issuperset(range(7)):
+            raise ValueError("At least one day of the week must be a working day")
+        # Ordinals of the working days in [_first, _last), sorted.
+        self._first = start_date.toordinal()
+        self._last = self._first
+        self._working_days: List[int] = []
+        self._grow_forward(self._MINIMUM_GROWTH_DAYS)
+
+    def with_skipped_dates(self, skipped_dates: Iterable[date]) -> "WorkingCalendar":
+        return WorkingCalendar(date.fromordinal(self._first),
+                               self._skipped_dates.union(skipped_dates),
+                               self._skipped_weekdays)
+
+    def is_working_day(self, day: date) -> bool:
+        return day.weekday() not in self._skipped_weekdays and day not in self._skipped_dates
+
+    def next_working_day(self, day: date) -> date:
+        index = self._index(day.toordinal())
+        self._ensure_working_days(index + 1)
+        return date.fromordinal(self._working_days[index])
+
+    def add_working_days(self, day: date, working_days: int) -> date:
+        # The day after the working_days-th working day on or after day, or
+        # day itself when there is nothing to allocate.
+        if working_days <= 0:
+            return day
+        index = self._index(day.toordinal())
+        self._ensure_working_days(index + working_days)
+        return date.fromordinal(self._working_days[index + working_days - 1] + 1)
+
+    def working_day_ordinals(self, day: date, count: int) -> List[int]:
+        # Ordinals of the first count working days on or after day.
+        index = self._index(day.toordinal())
+        self._ensure_working_days(index + count)
+        return self._working_days[index:index + count]
+
+    def working_days_between(self, start: date, end: date) -> int:
+        # Number of working days on or after start and before end.
+        return self._index(end.toordinal()) - self._index(start.toordinal())
+
+    def _index(self, ordinal: int) -> int:
+        if ordinal < self._first:
+            self._grow_backward(ordinal)
+        while ordinal >= self._last:
+            self._grow_forward(self._last - self._first)
+        return bisect_left(self._working_days, ordinal)
+
+    def _ensure_working_days(self, count: int):
+        while len(self._working_days) < count:
+            self._grow_forward(self._last - self._first)
+
+    def _grow_forward(self, days: int):
+        days = max(days, self._MINIMUM_GROWTH_DAYS)
+        self._working_days.extend(self._working_ordinals(self._last, self._last + days))
+        self._last += days
+
+    def _grow_backward(self, ordinal: int):
+        self._working_days[0:0] = self._working_ordinals(ordinal, self._first)
+        self._first = ordinal
+
+    def _working_ordinals(self, first: int, last: int) -> List[int]:
+        return [ordinal for ordinal in range(first, last)
+                if self.is_working_day(date.fromordinal(ordinal))]
+
+
+__all__ = ["WorkingCalendar"]